@@ -1,52 +1,181 @@
+import gzip
+import ipaddress
 import os
+import threading
+import time
 import logging
-from flask import Flask, render_template, request, jsonify
-from utils.excel_parser import load_cssd_data, get_cssd_requirements
+from flask import (Flask, Response, abort, g, render_template, request, jsonify, send_file, stream_with_context,
+                   url_for)
+from utils.bundle import BUNDLE_MAX_AGE, bundle_file, bundle_for
+from utils.data_store import CSSDDataStore
+from utils.datasets import data_dirs
+from utils.shared_data import shared_data_file
+from utils.batch import (DEFAULT_BATCH_MAX_ITEMS, BatchRequestError, iter_batch_json,
+                         parse_batch_request, parse_bed_count)
+from utils.logging_config import configure_logging, sample_request_detail
+from utils.metrics import request_latency
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (level, format and detail sampling come from the environment)
+configure_logging()
 
 # Create Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default-secret-key")
 
-# Load CSSD planning data from Excel file
+# Load CSSD planning data from the snapshot cache or the Excel file, or map it
+# from a file shared by all workers when CSSD_SHARED_DATA_FILE is set. Workbooks
+# in the CSSD_DATA_DIR directories are ingested as named data sets in parallel.
+data_store = CSSDDataStore(shared_file=shared_data_file(), data_dirs=data_dirs())
 try:
-    cssd_data = load_cssd_data()
+    data_store.load()
     logging.info("CSSD data loaded successfully")
 except Exception as e:
     logging.error(f"Error loading CSSD data: {e}")
-    cssd_data = None
+
+# Seconds browsers and proxies may reuse a GET /calculate response before revalidating
+cache_max_age = int(os.environ.get("CSSD_CACHE_MAX_AGE", "300"))
+
+# Record every calculation to DATABASE_URL (or a local SQLite file) in batches
+# from a background thread; CSSD_HISTORY=0 disables recording. SQLAlchemy is
+# only imported and the database only set up on first use, in each worker.
+history_enabled = os.environ.get("CSSD_HISTORY", "1") != "0"
+_history = None
+_history_lock = threading.Lock()
+
+def get_history():
+    """Return the calculation history writer, setting it up on first use (None if disabled or unavailable)"""
+    global _history, history_enabled
+    if _history is None and history_enabled:
+        with _history_lock:
+            if _history is None and history_enabled:
+                try:
+                    from utils.history import init_history
+                    _history = init_history()
+                except Exception as e:
+                    logging.error(f"Calculation history disabled: {e}")
+                    history_enabled = False
+    return _history
+
+# Maximum number of bed counts accepted by /calculate/batch
+batch_max_items = int(os.environ.get("CSSD_BATCH_MAX_ITEMS", DEFAULT_BATCH_MAX_ITEMS))
+
+# Reload the workbook in the background when it changes (0 disables polling)
+watch_interval = float(os.environ.get("CSSD_WATCH_INTERVAL", "5"))
+if watch_interval > 0:
+    data_store.start_watcher(watch_interval)
+    # Threads do not survive fork, so preloaded gunicorn workers start their own watcher
+    os.register_at_fork(after_in_child=lambda: data_store.restart_after_fork(watch_interval))
+
+def admin_authorized():
+    """Check the admin token; without one configured only direct local clients are allowed"""
+    token = os.environ.get("CSSD_ADMIN_TOKEN")
+    if token:
+        return request.headers.get("X-Admin-Token") == token
+    # A request relayed by a proxy on the same host would look local too
+    if 'X-Forwarded-For' in request.headers or 'Forwarded' in request.headers:
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (('method', request.method), ('route', route), ('status', response.status_code))
+        request_latency.observe(labels, time.perf_counter() - start)
+    return response
+
+def current_bundle():
+    """Return (data version, bucket table URL or None) of the active data"""
+    cssd_data = data_store.current()
+    if cssd_data is None or bundle_for(cssd_data) is None:
+        return data_store.version, None
+    return cssd_data['version'], url_for('data_bundle', version=cssd_data['version'])
 
 @app.route('/')
 def index():
-    """Render the main page"""
-    return render_template('index.html')
+    """Render the main page with the bucket table of the active data version"""
+    data_version, bundle_url = current_bundle()
+    return render_template('index.html', data_version=data_version, bundle_url=bundle_url)
 
-@app.route('/calculate', methods=['POST'])
+@app.route('/version', methods=['GET'])
+def data_version_info():
+    """Report the active data version and its bucket table, so open pages notice reloads"""
+    data_version, bundle_url = current_bundle()
+    response = jsonify({'version': data_version, 'bundle_url': bundle_url})
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/bundle/<version>.json')
+def data_bundle(version):
+    """Serve the compressed bucket table of a data version; its contents never change, so it is cached for a year"""
+    path = bundle_file(version)
+    if path is None or not path.is_file():
+        abort(404)
+    if 'gzip' in request.accept_encodings:
+        response = send_file(path, mimetype='application/json', max_age=BUNDLE_MAX_AGE)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        with gzip.open(path) as f:
+            response = Response(f.read(), mimetype='application/json')
+        response.cache_control.max_age = BUNDLE_MAX_AGE
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/calculate', methods=['GET', 'POST'])
 def calculate():
     """Calculate CSSD requirements based on bed count"""
     try:
-        bed_count = int(request.form.get('bed_count', 0))
+        # GET requests are cacheable by browsers and proxies; POST keeps the original form API
+        params = request.args if request.method == 'GET' else request.form
+        bed_count = int(params.get('bed_count', 0))
+        dataset = params.get('dataset') or None
+        
+        # Take one reference so a concurrent reload cannot change data mid-request
+        cssd_data = data_store.current(dataset)
         
         if bed_count <= 0:
             return jsonify({'error': 'Please enter a valid positive number of beds'})
         
+        if cssd_data is None and dataset is not None:
+            return jsonify({'error': f"Unknown dataset '{dataset}'"})
+        
         if cssd_data is None:
             return jsonify({'error': 'Error loading CSSD data. Please check the Excel file.'})
         
-        # Get requirements based on bed count
-        requirements = get_cssd_requirements(cssd_data, bed_count)
+        # Find the bucket for this bed count; its JSON was serialized at load time
+        index = cssd_data['index']
+        bucket = index.find(bed_count)
         
-        if requirements:
-            # Log equipment details for debugging
-            if 'equipment' in requirements and requirements['equipment']:
-                logging.info(f"Equipment count: {len(requirements['equipment'])}")
-                for i, item in enumerate(requirements['equipment']):
-                    logging.info(f"Equipment {i+1}: {item['name']}, Qty: {item['quantity']}, "
-                                 f"Unit Price: {item['unit_price']}, Total Price: {item['total_price']}")
+        if bucket is not None:
+            # Log equipment details for a sample of requests only; checked first so
+            # a mapped index only decodes its models when a request is sampled
+            equipment = index.ranges[bucket].equipment if sample_request_detail() else None
+            if equipment:
+                logging.debug(f"Equipment for {bed_count} beds: " + "; ".join(
+                    f"{item.name} x{item.quantity} @ {item.unit_price} = {item.total_price}"
+                    for item in equipment))
+            
+            duration_ms = (time.perf_counter() - g.request_start) * 1000
+            history = get_history()
+            if history is not None:
+                from utils.history import record_calculation
+                record_calculation(history, cssd_data, dataset or data_store.default_dataset,
+                                   bed_count, bucket, duration_ms)
             
-            return jsonify(requirements)
+            response = Response(index.response_json(bucket, bed_count), mimetype='application/json')
+            if request.method == 'GET':
+                return cacheable(response, cssd_data, bed_count)
+            return response
         else:
             return jsonify({'error': 'Could not determine requirements for the given bed count'})
             
@@ -56,5 +185,244 @@ def calculate():
         logging.error(f"Error calculating requirements: {e}")
         return jsonify({'error': f'An error occurred: {str(e)}'})
 
+def cacheable(response, cssd_data, bed_count):
+    """Add validators tied to the data version and answer conditional requests with 304"""
+    response.set_etag(f"{cssd_data.get('version')}-{bed_count}")
+    if cssd_data.get('modified'):
+        response.last_modified = cssd_data['modified']
+    response.cache_control.public = True
+    response.cache_control.max_age = cache_max_age
+    return response.make_conditional(request)
+
+@app.route('/calculate/batch', methods=['POST'])
+def calculate_batch():
+    """Calculate CSSD requirements for many bed counts in one request"""
+    cssd_data = data_store.current()
+    if cssd_data is None:
+        return jsonify({'error': 'Error loading CSSD data. Please check the Excel file.'}), 503
+    
+    try:
+        items = parse_batch_request(request.get_json(silent=True), batch_max_items)
+    except BatchRequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    # Stream the response so very large batches are never built in memory
+    body = iter_batch_json(cssd_data['index'], items, cssd_data.get('version'))
+    return Response(stream_with_context(body), mimetype='application/json')
+
+@app.route('/calculate/export', methods=['GET', 'POST'])
+def calculate_export():
+    """Download the requirements for one or many bed counts as a CSV or XLSX report"""
+    from utils.export import EXPORT_FORMATS, ExportCache, export_key, export_rows, iter_csv, write_xlsx
+    
+    if request.method == 'GET':
+        payload = {'bed_counts': request.args.getlist('bed_count')}
+        options = request.args
+    else:
+        payload = request.get_json(silent=True)
+        options = payload if isinstance(payload, dict) else {}
+    export_format = str(options.get('format') or request.args.get('format', 'csv')).lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    dataset = options.get('dataset') or None
+    cssd_data, error = dataset_or_error(dataset)
+    if error:
+        return error
+    
+    try:
+        items = parse_batch_request(payload, batch_max_items)
+    except BatchRequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    if not items:
+        return jsonify({'error': 'Provide at least one bed count'}), 400
+    
+    version = cssd_data.get('version')
+    key = export_key(version, dataset, export_format, items)
+    download_name = f"cssd_requirements_{version}.{export_format}"
+    rows = export_rows(cssd_data, items)
+    cache = ExportCache()
+    
+    path = cache.get(key, export_format)
+    if path is None and export_format == 'xlsx':
+        path = cache.store(key, export_format, lambda tmp_path: write_xlsx(rows, tmp_path))
+    if path is not None:
+        return send_file(path, mimetype=EXPORT_FORMATS[export_format], as_attachment=True,
+                         download_name=download_name, etag=key, max_age=cache_max_age)
+    
+    # Stream the CSV to the client while it is written to the cache
+    body = cache.tee(key, export_format, iter_csv(rows))
+    response = Response(stream_with_context(body), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return response
+
+@app.route('/portfolio/rollup', methods=['POST'])
+def portfolio_rollup():
+    """Aggregate equipment quantities, costs and budget comparisons over many facilities"""
+    # NumPy is only needed for portfolio costing, so keep it off the startup path
+    from utils.costing import cost_matrix_for
+    
+    cssd_data = data_store.current()
+    if cssd_data is None:
+        return jsonify({'error': 'Error loading CSSD data. Please check the Excel file.'}), 503
+    
+    try:
+        items = parse_batch_request(request.get_json(silent=True), batch_max_items)
+    except BatchRequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    bed_counts = []
+    for _, raw_bed_count in items:
+        try:
+            bed_counts.append(parse_bed_count(raw_bed_count))
+        except ValueError:
+            bed_counts.append(0)  # Counted as unresolved
+    
+    rollup = cost_matrix_for(cssd_data).rollup(bed_counts)
+    rollup['version'] = cssd_data.get('version')
+    return jsonify(rollup)
+
+def request_params():
+    """Return query parameters for GET and JSON or form parameters for POST"""
+    if request.method == 'GET':
+        return request.args
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else request.form
+
+def dataset_or_error(dataset):
+    """Return (data, None) for the requested data set, or (None, error response)"""
+    cssd_data = data_store.current(dataset)
+    if cssd_data is not None:
+        return cssd_data, None
+    if dataset is not None:
+        return None, (jsonify({'error': f"Unknown dataset '{dataset}'"}), 404)
+    return None, (jsonify({'error': 'Error loading CSSD data. Please check the Excel file.'}), 503)
+
+@app.route('/sizing', methods=['GET', 'POST'])
+def sizing():
+    """Size CSSD requirements for any bed count from throughput and interpolated workbook data"""
+    from utils.sizing import SizingParameters, sizing_bed_count, sizing_engine_for
+    
+    params = request_params()
+    cssd_data, error = dataset_or_error(params.get('dataset') or None)
+    if error:
+        return error
+    
+    try:
+        bed_count = sizing_bed_count(params.get('bed_count'))
+        parameters = SizingParameters.from_mapping(params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result = sizing_engine_for(cssd_data).estimate(bed_count, parameters)
+    result['version'] = cssd_data.get('version')
+    return jsonify(result)
+
+@app.route('/sizing/curve', methods=['GET', 'POST'])
+def sizing_curve():
+    """Evaluate sized requirements over a whole bed-count range for charting"""
+    from utils.sizing import SizingParameters, curve_bed_counts, sizing_engine_for
+    
+    params = request_params()
+    cssd_data, error = dataset_or_error(params.get('dataset') or None)
+    if error:
+        return error
+    
+    try:
+        bed_counts = curve_bed_counts(params.get('start', 1), params.get('stop', 5000), params.get('step', 1))
+        parameters = SizingParameters.from_mapping(params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result = sizing_engine_for(cssd_data).curve_json(bed_counts, parameters)
+    result['version'] = cssd_data.get('version')
+    return jsonify(result)
+
+@app.route('/whatif', methods=['POST'])
+def whatif():
+    """Compare scenarios (bed deltas, autoclave choice, price and quantity overrides) with a base bed count"""
+    from utils.whatif import parse_whatif_request, whatif_engine_for
+    
+    payload = request.get_json(silent=True)
+    dataset = payload.get('dataset') if isinstance(payload, dict) else None
+    cssd_data, error = dataset_or_error(dataset or None)
+    if error:
+        return error
+    
+    engine = whatif_engine_for(cssd_data)
+    try:
+        bed_count, scenarios = parse_whatif_request(payload, engine.equipment_names)
+        result = engine.compare(bed_count, scenarios)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result['version'] = cssd_data.get('version')
+    return jsonify(result)
+
+@app.route('/history', methods=['GET'])
+def calculation_history():
+    """List recorded calculations, newest first, paginated with before_id"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    history = get_history()
+    if history is None:
+        return jsonify({'error': 'Calculation history is disabled'}), 404
+    from utils.history import query_history
+    
+    try:
+        bed_count = request.args.get('bed_count', type=int)
+        before_id = request.args.get('before_id', type=int)
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    return jsonify(query_history(history.engine, bed_count, request.args.get('dataset'), before_id, limit))
+
+@app.route('/history/stats', methods=['GET'])
+def calculation_stats():
+    """Summarize calculation volume and latency per day and bed range"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    history = get_history()
+    if history is None:
+        return jsonify({'error': 'Calculation history is disabled'}), 404
+    from utils.history import usage_stats
+    
+    try:
+        days = min(max(int(request.args.get('days', 30)), 1), 366)
+    except ValueError:
+        return jsonify({'error': 'days must be a number'}), 400
+    stats = usage_stats(history.engine, days, request.args.get('dataset'))
+    stats['writer'] = history.status()
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose request latency histograms in Prometheus text format"""
+    return Response(request_latency.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz', methods=['GET'])
+def health():
+    """Report whether workbook data is being served; 503 lets load balancers and monitors see a failed load"""
+    healthy, summary = data_store.health()
+    return jsonify(summary), 200 if healthy else 503
+
+@app.route('/admin/data', methods=['GET'])
+def data_status():
+    """Report the active CSSD data version"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(data_store.status())
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_data():
+    """Reparse the planning workbook and swap in the new data if it is valid"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    force = request.args.get('force') == '1'
+    reloaded = data_store.reload(force=force)
+    status = data_store.status()
+    status['reloaded'] = reloaded
+    return jsonify(status), 200 if status['last_error'] is None else 500
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,291 @@
+"""
+ASGI entry point serving the calculator API from a single event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+/calculate, /calculate/batch and /portfolio/rollup are handled natively on
+the event loop, so slow or idle keep-alive clients never hold a worker.
+Everything else (the page, static files, /metrics, /admin/*) is passed to
+the Flask app through a WSGI bridge running in a thread pool, which also
+keeps admin-triggered workbook reparsing off the loop. Background reloads
+already run in the data store's watcher thread.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.http import http_date
+
+from app import app as flask_app, batch_max_items, cache_max_age, data_store, get_history
+from utils.batch import BatchRequestError, iter_batch_json, parse_batch_request, parse_bed_count
+from utils.metrics import request_latency
+
+LOAD_ERROR = {'error': 'Error loading CSSD data. Please check the Excel file.'}
+
+
+class CalculatorASGI:
+    """
+    Minimal ASGI application with native calculator routes and a WSGI fallback.
+    """
+
+    def __init__(self, wsgi_app, store, max_workers=None):
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cssd-asgi')
+        self.routes = {
+            '/calculate': ({'GET', 'POST'}, self.calculate),
+            '/calculate/batch': ({'POST'}, self.calculate_batch),
+            '/portfolio/rollup': ({'POST'}, self.portfolio_rollup),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        route = self.routes.get(scope['path'])
+        if route is None or scope['method'] not in route[0]:
+            await self.call_wsgi(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = await route[1](scope, receive, send)
+        if status is None:
+            return  # Passed to the Flask app, which records its own latency
+        labels = (('method', scope['method']), ('route', scope['path']), ('status', status))
+        request_latency.observe(labels, time.perf_counter() - start)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # The data store was already loaded when the Flask app was imported
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def calculate(self, scope, receive, send):
+        """Calculate CSSD requirements based on bed count (GET query or POST form)"""
+        started = time.perf_counter()
+        if scope['method'] == 'GET':
+            params = parse_qs(scope['query_string'].decode('latin-1'))
+        elif content_type(scope) == 'application/x-www-form-urlencoded':
+            params = parse_qs((await read_body(receive)).decode('utf-8', 'replace'))
+        else:
+            # Multipart and other form encodings are parsed by the Flask route
+            await self.call_wsgi(scope, receive, send)
+            return None
+
+        try:
+            bed_count = int(params.get('bed_count', ['0'])[0])
+        except ValueError:
+            return await send_json(send, {'error': 'Please enter a valid number of beds'})
+
+        dataset = params.get('dataset', [None])[0]
+        cssd_data = self.store.current(dataset)
+        if bed_count <= 0:
+            return await send_json(send, {'error': 'Please enter a valid positive number of beds'})
+        if cssd_data is None and dataset is not None:
+            return await send_json(send, {'error': f"Unknown dataset '{dataset}'"})
+        if cssd_data is None:
+            return await send_json(send, LOAD_ERROR)
+
+        index = cssd_data['index']
+        bucket = index.find(bed_count)
+        if bucket is None:
+            return await send_json(send, {'error': 'Could not determine requirements for the given bed count'})
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        history = get_history()
+        if history is not None:
+            from utils.history import record_calculation
+            record_calculation(history, cssd_data, dataset or self.store.default_dataset,
+                               bed_count, bucket, duration_ms)
+
+        headers = [(b'content-type', b'application/json')]
+        if scope['method'] == 'GET':
+            etag = f'"{cssd_data.get("version")}-{bed_count}"'
+            if etag in header_value(scope, b'if-none-match'):
+                await send_response(send, 304, b'', [(b'etag', etag.encode())])
+                return 304
+            headers += [(b'etag', etag.encode()),
+                        (b'cache-control', f'public, max-age={cache_max_age}'.encode())]
+            if cssd_data.get('modified'):
+                headers.append((b'last-modified', http_date(cssd_data['modified']).encode()))
+        return await send_response(send, 200, index.response_json(bucket, bed_count), headers)
+
+    async def calculate_batch(self, scope, receive, send):
+        """Calculate CSSD requirements for many bed counts, streaming the response"""
+        cssd_data = self.store.current()
+        if cssd_data is None:
+            return await send_json(send, LOAD_ERROR, 503)
+        try:
+            items = parse_batch_request(parse_json(await read_body(receive)), batch_max_items)
+        except BatchRequestError as e:
+            return await send_json(send, {'error': str(e)}, e.status)
+
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json')]})
+        chunk = []
+        for part in iter_batch_json(cssd_data['index'], items, cssd_data.get('version')):
+            chunk.append(part)
+            if len(chunk) >= 256:
+                await send({'type': 'http.response.body', 'body': ''.join(chunk).encode(), 'more_body': True})
+                chunk = []
+        await send({'type': 'http.response.body', 'body': ''.join(chunk).encode()})
+        return 200
+
+    async def portfolio_rollup(self, scope, receive, send):
+        """Aggregate costs over many facilities, computed in the thread pool"""
+        from utils.costing import cost_matrix_for
+
+        cssd_data = self.store.current()
+        if cssd_data is None:
+            return await send_json(send, LOAD_ERROR, 503)
+        try:
+            items = parse_batch_request(parse_json(await read_body(receive)), batch_max_items)
+        except BatchRequestError as e:
+            return await send_json(send, {'error': str(e)}, e.status)
+
+        bed_counts = []
+        for _, raw_bed_count in items:
+            try:
+                bed_counts.append(parse_bed_count(raw_bed_count))
+            except ValueError:
+                bed_counts.append(0)  # Counted as unresolved
+
+        loop = asyncio.get_running_loop()
+        rollup = await loop.run_in_executor(self.executor,
+                                            lambda: cost_matrix_for(cssd_data).rollup(bed_counts))
+        rollup['version'] = cssd_data.get('version')
+        return await send_json(send, rollup)
+
+    async def call_wsgi(self, scope, receive, send):
+        """Run the Flask app for this request in the thread pool and stream its response"""
+        body = await read_body(receive)
+        environ = wsgi_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        result = {}
+
+        def start_response(status, headers, exc_info=None):
+            result['status'] = int(status.split(' ', 1)[0])
+            result['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                 for name, value in headers]
+
+        def relay(message):
+            # Wait until the loop has sent the message, so slow clients throttle the app
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run():
+            # The whole response is iterated in one thread, so streamed
+            # generators (stream_with_context) keep their request context
+            response = self.wsgi_app(environ, start_response)
+            started = False
+            try:
+                for chunk in response:
+                    if not chunk:
+                        continue
+                    if not started:
+                        # Headers go out with the first non-empty chunk (PEP 3333)
+                        relay({'type': 'http.response.start', 'status': result['status'],
+                               'headers': result['headers']})
+                        started = True
+                    relay({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if not started:
+                    relay({'type': 'http.response.start', 'status': result['status'],
+                           'headers': result['headers']})
+                relay({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+
+        await loop.run_in_executor(self.executor, run)
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+def parse_json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def header_value(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+def content_type(scope):
+    """The media type of the request body, without parameters such as charset."""
+    return header_value(scope, b'content-type').split(';', 1)[0].strip().lower()
+
+
+async def send_response(send, status, body, headers):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+    return status
+
+
+async def send_json(send, payload, status=200):
+    return await send_response(send, status, json.dumps(payload).encode(),
+                               [(b'content-type', b'application/json')])
+
+
+def wsgi_environ(scope, body):
+    """
+    Build a PEP 3333 environ for an ASGI HTTP scope with a fully read body.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            key = 'HTTP_' + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+app = CalculatorASGI(flask_app, data_store,
+                     max_workers=int(os.environ.get("CSSD_ASGI_THREADS", "8")))
+logging.info("ASGI calculator app ready")
@@ -0,0 +1,200 @@
+"""
+Compare the gunicorn sync deployment with the ASGI serving mode under many
+concurrent keep-alive connections:
+
+    python -m benchmarks.concurrency                       # both servers, default load
+    python -m benchmarks.concurrency --connections 500 --slow 50 --duration 20
+
+Each server is started on a free local port. The client opens --connections
+persistent HTTP/1.1 connections that send GET /calculate requests back to
+back, while --slow further connections trickle POST /calculate form bodies a
+few bytes at a time, the way a slow mobile client would. Throughput and
+latency of the fast connections are reported for each server as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.run import summarize
+
+ROOT = Path(__file__).parent.parent
+
+SERVERS = {
+    'gunicorn-sync': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+        '--preload', '--log-level', 'warning', 'main:app'],
+    'uvicorn-asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(port),
+        '--log-level', 'warning', '--no-access-log', 'asgi:app'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def read_response(reader):
+    """
+    Read one HTTP/1.1 response and return (status code, keep-alive).
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    length, chunked, keep_alive = 0, False, True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+        elif name == 'connection' and 'close' in value.lower():
+            keep_alive = False
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return int(status_line.split()[1]), keep_alive
+
+
+async def fast_client(port, stop_at, samples, errors, rng):
+    """
+    Send GET /calculate requests back to back, reconnecting (inside the timed
+    request) whenever the server does not keep the connection alive.
+    """
+    writer = None
+    try:
+        while time.monotonic() < stop_at:
+            request = (f"GET /calculate?bed_count={rng.randint(1, 2000)} HTTP/1.1\r\n"
+                       f"Host: localhost\r\n\r\n").encode()
+            start = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            samples.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+        errors.append('disconnect')
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def slow_client(port, stop_at, interval):
+    """
+    Keep re-sending a POST /calculate form body one byte every interval seconds.
+    """
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return
+    try:
+        while time.monotonic() < stop_at:
+            body = b'bed_count=150'
+            writer.write(b"POST /calculate HTTP/1.1\r\nHost: localhost\r\n"
+                         b"Content-Type: application/x-www-form-urlencoded\r\n"
+                         b"Content-Length: %d\r\n\r\n" % len(body))
+            for byte in body:
+                await asyncio.sleep(interval)
+                writer.write(bytes([byte]))
+                await writer.drain()
+            await read_response(reader)
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def drive(port, connections, slow, duration, trickle_interval):
+    stop_at = time.monotonic() + duration
+    samples, errors = [], []
+    rng = random.Random(42)
+    slow_tasks = [asyncio.create_task(slow_client(port, stop_at, trickle_interval)) for _ in range(slow)]
+    await asyncio.sleep(0.5)  # Let the slow clients occupy their connections first
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fast_client(port, stop_at, samples, errors, rng) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    for task in slow_tasks:
+        task.cancel()
+    await asyncio.gather(*slow_tasks, return_exceptions=True)
+
+    result = {'requests': len(samples), 'errors': len(errors), 'requests_per_second': len(samples) / elapsed}
+    if samples:
+        result.update(summarize(samples))
+    return result
+
+
+def bench_server(name, args):
+    port = free_port()
+    env = dict(os.environ, CSSD_WATCH_INTERVAL='0')
+    process = subprocess.Popen(SERVERS[name](port, args.workers), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        result = asyncio.run(drive(port, args.connections, args.slow, args.duration, args.trickle_interval))
+    finally:
+        process.terminate()
+        process.wait()
+    return {'server': name, **result}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare gunicorn sync and ASGI serving under concurrent load.")
+    parser.add_argument('--server', choices=sorted(SERVERS), action='append', help="Run only these servers")
+    parser.add_argument('--connections', type=int, default=200, help="Concurrent keep-alive connections")
+    parser.add_argument('--slow', type=int, default=20, help="Additional slow-trickling connections")
+    parser.add_argument('--trickle-interval', type=float, default=0.2, help="Seconds between slow client bytes")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to run each server")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn sync worker count")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = {
+        'connections': args.connections,
+        'slow_connections': args.slow,
+        'duration_s': args.duration,
+        'gunicorn_workers': args.workers,
+        'results': [bench_server(name, args) for name in args.server or list(SERVERS)]
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
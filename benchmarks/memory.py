@@ -0,0 +1,122 @@
+"""
+Compare the per-worker memory footprint of the CSSD data model.
+
+"legacy" rebuilds the previous representation (sheet1/sheet2 lists of nested
+dicts plus one prebuilt payload dict per bucket) from the same parsed data;
+"slotted" is the current BedRange/EquipmentLine model with its compiled
+index. Sizes are deep sizes with shared objects counted once:
+
+    python -m benchmarks.memory [--scale 100]
+"""
+import argparse
+import json
+import logging
+import sys
+from dataclasses import replace
+
+from utils.bed_index import BedRangeIndex
+from utils.excel_parser import load_cssd_data
+from utils.models import intern_text
+
+
+def deep_size(obj, seen=None):
+    """
+    Return the total size of obj and everything it references, counting shared objects once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_size(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+def legacy_structure(ranges):
+    """
+    Rebuild the pre-dataclass representation, copying strings the way the old
+    parser produced one str per cell.
+    """
+    def copy_text(value):
+        return ''.join(list(value)) if isinstance(value, str) else value
+
+    sheet1, sheet2, payloads = [], [], []
+    for bed_range in ranges:
+        equipment = [{
+            'name': copy_text(item.name),
+            'specification': copy_text(item.specification),
+            'quantity': item.quantity,
+            'unit_price': item.unit_price if item.unit_price is not None else "Not specified",
+            'total_price': item.total_price if item.total_price is not None else "Not specified"
+        } for item in bed_range.equipment]
+        area_row = {
+            'min_beds': bed_range.min_beds, 'max_beds': bed_range.max_beds,
+            'original_range': copy_text(bed_range.original_range),
+            'data': {'Area (sq ft)': bed_range.area if bed_range.area is not None else "Not specified"},
+            'equipment': equipment,
+            'official_min_budget': bed_range.budget.min, 'official_max_budget': bed_range.budget.max
+        }
+        sheet1.append(area_row)
+        sheet2.append({
+            'min_beds': bed_range.min_beds, 'max_beds': bed_range.max_beds,
+            'original_range': copy_text(bed_range.original_range),
+            'data': {'Autoclave Model': copy_text(bed_range.autoclave_model or "Not specified"),
+                     'Quantity': bed_range.autoclave_quantity}
+        })
+        payloads.append(bed_range.to_dict() | {'equipment': equipment})
+    return {'sheet1': sheet1, 'sheet2': sheet2, 'payloads': payloads}
+
+
+def scaled_ranges(ranges, scale):
+    """
+    Replicate the workbook's bed ranges scale times with shifted boundaries,
+    giving each copy its own (uninterned) specification strings.
+    """
+    width = max(r.max_beds for r in ranges if r.max_beds is not None) + 1
+    scaled = []
+    for copy in range(scale):
+        offset = copy * width
+        for r in ranges:
+            equipment = tuple(replace(item, specification=f"{item.specification} #{copy % 7}")
+                              for item in r.equipment)
+            scaled.append(replace(r, min_beds=r.min_beds + offset, max_beds=r.max_beds + offset,
+                                  original_range=f"{r.min_beds + offset}-{r.max_beds + offset}",
+                                  equipment=equipment))
+    return scaled
+
+
+def intern_ranges(ranges):
+    return [replace(r, equipment=tuple(replace(item, specification=intern_text(item.specification))
+                                       for item in r.equipment)) for r in ranges]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare CSSD data model memory footprints.")
+    parser.add_argument('--scale', type=int, default=100, help="Replication factor for the synthetic data set")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    ranges = list(load_cssd_data()['ranges'])
+
+    results = []
+    for name, data_ranges in (('workbook', ranges), (f'workbook x{args.scale}', scaled_ranges(ranges, args.scale))):
+        slotted = intern_ranges(data_ranges)
+        index = BedRangeIndex.from_ranges(slotted)
+        results.append({
+            'data_set': name,
+            'bed_ranges': len(data_ranges),
+            'legacy_bytes': deep_size(legacy_structure(data_ranges)),
+            'slotted_bytes': deep_size((slotted, index.starts, index.stops)),
+            'slotted_with_json_bytes': deep_size((slotted, index.starts, index.stops, index.payload_json)),
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
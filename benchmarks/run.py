@@ -0,0 +1,261 @@
+"""
+Benchmark suite for workbook parsing, bed-count lookups and the /calculate route.
+
+Results are written as JSON so runs can be compared between commits:
+
+    python -m benchmarks.run                          # writes benchmarks/results/<commit>.json
+    python -m benchmarks.run --quick --output a.json
+    python -m benchmarks.run --compare benchmarks/results/<older>.json
+
+Suites:
+  parse   load_cssd_data on the shipped workbook and on synthetic workbooks
+          scaled up to thousands of bed-range columns and hundreds of equipment rows
+  lookup  get_cssd_requirements / BedRangeIndex.find latency over the bed-count domain,
+          and a full 1-5000 bed sizing curve
+  load    in-process load test of /calculate through the Flask test client
+  ingest  parallel ingestion of a directory of synthetic workbooks by worker count
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# (bed-range columns, equipment blocks) for the synthetic parse benchmarks
+PARSE_SIZES = [(100, 50), (1000, 100), (2000, 100)]
+QUICK_PARSE_SIZES = [(100, 50), (500, 100)]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples):
+    """
+    Return latency statistics in milliseconds for a list of durations in seconds.
+    """
+    return {
+        'runs': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'min_ms': min(samples) * 1000
+    }
+
+
+def time_calls(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_parse(quick):
+    from benchmarks.synthetic import EQUIPMENT_LABELS, write_synthetic_workbook
+    from utils.excel_parser import DEFAULT_EXCEL_FILE, load_cssd_data
+    import tracemalloc
+
+    results = []
+    sheet_map_dir = os.environ.get("CSSD_SHEET_MAP_DIR")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Compiled sheet maps go to the temporary directory, not instance/
+            os.environ["CSSD_SHEET_MAP_DIR"] = str(Path(tmp) / "sheet_maps")
+            workbooks = [('shipped workbook', DEFAULT_EXCEL_FILE)]
+            for ranges, equipment in (QUICK_PARSE_SIZES if quick else PARSE_SIZES):
+                path = Path(tmp) / f"synthetic_{ranges}x{equipment}.xlsx"
+                write_synthetic_workbook(path, ranges=ranges, equipment=equipment)
+                # Blocks past the recognised labels are scanned but not parsed
+                parsed = min(equipment, len(EQUIPMENT_LABELS))
+                workbooks.append((f"synthetic {ranges} ranges x {parsed} equipment"
+                                  f" + {equipment - parsed} ignored blocks", path))
+
+            for name, path in workbooks:
+                # The first parse detects the layout; later ones read the cached sheet map
+                start = time.perf_counter()
+                load_cssd_data(path)
+                first_parse_ms = (time.perf_counter() - start) * 1000
+                repeat = 10 if 'shipped' in name else 2
+                result = {'workbook': name, **summarize(time_calls(lambda: load_cssd_data(path), repeat))}
+                result['first_parse_ms'] = first_parse_ms
+
+                tracemalloc.start()
+                data = load_cssd_data(path)
+                result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+                result['bed_ranges'] = len(data['index'])
+                results.append(result)
+    finally:
+        if sheet_map_dir is None:
+            os.environ.pop("CSSD_SHEET_MAP_DIR", None)
+        else:
+            os.environ["CSSD_SHEET_MAP_DIR"] = sheet_map_dir
+    return results
+
+
+def bench_lookup(quick):
+    from utils.excel_parser import get_cssd_requirements, load_cssd_data
+
+    data = load_cssd_data()
+    index = data['index']
+    domain = range(1, 2101)  # Includes counts past the last range
+    repeat = 20 if quick else 200
+
+    def sweep(func):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for bed_count in domain:
+                func(bed_count)
+        return (time.perf_counter() - start) / (repeat * len(domain))
+
+    from utils.sizing import curve_bed_counts, sizing_engine_for
+
+    engine = sizing_engine_for(data)
+    curve = curve_bed_counts(1, 5000)
+    curve_samples = time_calls(lambda: engine.curve_json(curve), 5 if quick else 50)
+
+    return {
+        'domain': [domain.start, domain.stop - 1],
+        'sizing_curve_5000_ms': statistics.median(curve_samples) * 1000,
+        'index_find_ns': sweep(index.find) * 1e9,
+        'response_json_ns': sweep(lambda b: index.find(b) is not None and index.response_json(index.find(b), b)) * 1e9,
+        'get_cssd_requirements_ns': sweep(lambda b: get_cssd_requirements(data, b)) * 1e9
+    }
+
+
+def bench_load(quick):
+    os.environ.setdefault('CSSD_WATCH_INTERVAL', '0')
+    # Measure request handling only, without queueing or writing history rows
+    os.environ.setdefault('CSSD_HISTORY', '0')
+    from app import app
+
+    client = app.test_client()
+    requests = 2000 if quick else 20000
+    rng = random.Random(42)
+    bed_counts = [rng.randint(1, 2000) for _ in range(requests)]
+
+    results = []
+    scenarios = [
+        ('POST /calculate', lambda b: client.post('/calculate', data={'bed_count': b})),
+        ('GET /calculate', lambda b: client.get(f'/calculate?bed_count={b}')),
+    ]
+    for name, call in scenarios:
+        for bed_count in bed_counts[:100]:
+            call(bed_count)  # Warm up
+        samples = []
+        start = time.perf_counter()
+        for bed_count in bed_counts:
+            t = time.perf_counter()
+            response = call(bed_count)
+            samples.append(time.perf_counter() - t)
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - start
+        results.append({'scenario': name, 'requests_per_second': requests / elapsed, **summarize(samples)})
+    return results
+
+
+def bench_ingest(quick):
+    from benchmarks.synthetic import EQUIPMENT_LABELS, write_synthetic_workbook
+    from utils.datasets import ingest_datasets
+
+    workbooks = 4 if quick else 8
+    cpus = os.cpu_count() or 1
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        data_dir.mkdir()
+        for i in range(workbooks):
+            write_synthetic_workbook(data_dir / f"region_{i}.xlsx", ranges=200, equipment=50)
+
+        for workers in sorted({1, 2, 4, cpus}):
+            if workers > cpus:
+                continue
+            start = time.perf_counter()
+            datasets = ingest_datasets([data_dir], cache_dir=Path(tmp) / "cache", max_workers=workers, force=True)
+            results.append({'workbooks': workbooks, 'workers': workers, 'datasets': len(datasets),
+                            'ingest_ms': (time.perf_counter() - start) * 1000})
+    return results
+
+
+SUITES = {'parse': bench_parse, 'lookup': bench_lookup, 'load': bench_load, 'ingest': bench_ingest}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current, baseline):
+    """
+    Print the relative change of every latency/throughput metric against a baseline run.
+    """
+    def metrics(results, prefix=''):
+        if isinstance(results, dict):
+            label = results.get('workbook') or results.get('scenario')
+            if label is None and 'workers' in results:
+                label = f"{results['workers']} workers"
+            for key, value in results.items():
+                if isinstance(value, (int, float)) and (key.endswith(('_ms', '_ns', '_mb')) or key == 'requests_per_second'):
+                    yield f"{prefix}{label + ' ' if label else ''}{key}", value
+        elif isinstance(results, list):
+            for item in results:
+                yield from metrics(item, prefix)
+
+    for suite, results in current['suites'].items():
+        old = dict(metrics(baseline['suites'].get(suite, []), f"{suite}: "))
+        for key, value in metrics(results, f"{suite}: "):
+            if key in old and old[key]:
+                print(f"{key:70s} {old[key]:12.3f} -> {value:12.3f} ({(value - old[key]) / old[key]:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the CSSD benchmark suite.")
+    parser.add_argument('--suite', choices=sorted(SUITES), action='append', help="Run only these suites")
+    parser.add_argument('--quick', action='store_true', help="Smaller inputs and fewer repetitions")
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Previous result file to compare against")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    sys.path.insert(0, str(ROOT))
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'suites': {}
+    }
+    for name in args.suite or list(SUITES):
+        report['suites'][name] = SUITES[name](args.quick)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report['suites'], indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == '__main__':
+    main()
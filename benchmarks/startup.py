@@ -0,0 +1,81 @@
+"""
+Measure worker startup time and resident memory for importing the app.
+
+Each scenario imports app.py in a fresh interpreter, the same way a gunicorn
+worker does, and reports wall time, peak RSS and whether the heavy Excel
+dependencies were imported:
+
+    python -m benchmarks.startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+PROBE = """
+import json, logging, resource, sys, time
+logging.disable(logging.CRITICAL)
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'import_seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy_modules': [m for m in ('pandas', 'numpy', 'openpyxl') if m in sys.modules],
+}))
+"""
+
+
+def run_probe(env):
+    """
+    Import the app in a fresh interpreter and return the probe measurements.
+    """
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(name, env, runs):
+    samples = [run_probe(env) for _ in range(runs)]
+    return {
+        'scenario': name,
+        'runs': runs,
+        'import_seconds_median': statistics.median(s['import_seconds'] for s in samples),
+        'max_rss_mb_median': statistics.median(s['max_rss_kb'] for s in samples) / 1024,
+        'heavy_modules': samples[-1]['heavy_modules'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app startup time and per-worker RSS.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per scenario")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_file = str(Path(tmp) / 'cssd_snapshot.pickle')
+        parse_env = dict(os.environ, CSSD_SNAPSHOT_FILE=str(Path(tmp) / 'missing' / 'none.pickle'))
+        snapshot_env = dict(os.environ, CSSD_SNAPSHOT_FILE=snapshot_file)
+
+        # Prebuild the snapshot used by the warm scenario
+        subprocess.run([sys.executable, '-m', 'utils.snapshot', '--output', snapshot_file],
+                       cwd=ROOT, env=snapshot_env, capture_output=True, check=True)
+
+        # Make the cold scenario's snapshot location unwritable so every run parses
+        Path(tmp, 'missing').write_text('')
+
+        results = [
+            measure('parse workbook', parse_env, args.runs),
+            measure('prebuilt snapshot', snapshot_env, args.runs),
+        ]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
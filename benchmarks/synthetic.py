@@ -0,0 +1,78 @@
+"""
+Generate synthetic planning workbooks with the same layout as
+static/data/cssd_planning.xlsx, scaled to many bed-range columns and
+equipment rows:
+
+    python -m benchmarks.synthetic out.xlsx --ranges 2000 --equipment 300
+
+The planning schema only knows the equipment labels listed below, so at most
+len(EQUIPMENT_LABELS) blocks are parsed. Further blocks get distinct labels
+the schema does not list: the parser streams and reports them but ignores
+their values, so they measure the cost of scanning extra rows only.
+"""
+import argparse
+
+from utils.sheet_schema import PLANNING_SHEET
+
+# Row labels as they appear in the real workbook, typos included
+EQUIPMENT_LABELS = [
+    "Cyliendrical Autoclave", "Reactangular Autoclave", "Vertical Autoclave", "Flash Autoclave",
+    "ETO\nSize", "Heat Sealing Machine", "ETO Packing Table", "Washer Disinfector\nSize", "Ultrasonic Cleaner\nSize",
+    "Hot Air Ovan", "Pass Box Qty\nSize", "Storage Rack Qty\nSize", "Open Trolly",
+    "Close Trolly\nSize", "Work Table Size"
+]
+
+
+def equipment_label(block):
+    """
+    Label of the block-th equipment block: a recognised label for the first
+    len(EQUIPMENT_LABELS) blocks, an unlisted (ignored) one after that.
+    """
+    if block < len(EQUIPMENT_LABELS):
+        return EQUIPMENT_LABELS[block]
+    return f"Unlisted Equipment {block + 1}"
+
+
+def write_synthetic_workbook(path, ranges=14, equipment=14, width=20):
+    """
+    Write a workbook with `ranges` bed-range columns of `width` beds each and
+    `equipment` equipment blocks (Size/Qty/Rate/Amount rows) labelled by
+    equipment_label(), so only the first len(EQUIPMENT_LABELS) are parsed.
+    """
+    from openpyxl import Workbook
+
+    assert len(EQUIPMENT_LABELS) == sum(block.kind == 'equipment' for block in PLANNING_SHEET.blocks)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Thumbrule : CSSD Design & Equipment"])
+    sheet.append([])
+    sheet.append(["Hospital Bed Size", "Parameter"] +
+                 [f"{i * width}-{(i + 1) * width}" for i in range(ranges)])
+    sheet.append(["CSSD area Required in Sq ft", None] + [150 + 50 * i for i in range(ranges)])
+
+    for block in range(equipment):
+        label = equipment_label(block)
+        rate = 45000 + 5000 * block
+        quantities = [(i + block) % 4 for i in range(ranges)]
+        sheet.append([label, "Size"] + [f"{block % 5 + 2}×3×3" for _ in range(ranges)])
+        sheet.append([None, "Qty"] + quantities)
+        sheet.append([None, "Rate"] + [rate] * ranges)
+        sheet.append([None, "Amount"] + [rate * qty for qty in quantities])
+
+    sheet.append(["Expected Tentative Budget", "Minimum"] + [600000 + 10000 * i for i in range(ranges)])
+    sheet.append([None, "Maximum"] + [800000 + 12500 * i for i in range(ranges)])
+    workbook.save(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic CSSD planning workbook.")
+    parser.add_argument('output', help="Path of the workbook to write")
+    parser.add_argument('--ranges', type=int, default=14, help="Number of bed-range columns")
+    parser.add_argument('--equipment', type=int, default=14, help="Number of equipment blocks")
+    args = parser.parse_args(argv)
+    write_synthetic_workbook(args.output, args.ranges, args.equipment)
+
+
+if __name__ == '__main__':
+    main()
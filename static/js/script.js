@@ -1,4 +1,70 @@
 $(document).ready(function() {
+    // Bucket table of the server's data version (see utils/bundle.py). While it is
+    // loaded, lookups are answered locally; otherwise they go to /calculate.
+    let bucketTable = null;
+    
+    // Seconds between checks that the server still serves the table's data version
+    const VERSION_CHECK_INTERVAL = 30;
+    let lastVersionCheck = Date.now();
+    
+    loadBucketTable($('#cssdForm').attr('data-bundle-url'), $('#cssdForm').attr('data-version'));
+    
+    // Fetch the bucket table of a data version; it is cached by the browser for good
+    function loadBucketTable(url, version) {
+        if (!url) {
+            return;
+        }
+        $.ajax({ url: url, dataType: 'json', cache: true }).done(function(table) {
+            if (table && table.version === version) {
+                bucketTable = table;
+            }
+        });
+    }
+    
+    // Ask the server for its data version now and then. When it has changed (a
+    // reload), drop the stale table, answer the last lookup from /calculate and
+    // switch to the new version's table.
+    function checkVersion(bedCount) {
+        if (!bucketTable || Date.now() - lastVersionCheck < VERSION_CHECK_INTERVAL * 1000) {
+            return;
+        }
+        lastVersionCheck = Date.now();
+        $.ajax({ url: '/version', dataType: 'json', cache: false }).done(function(current) {
+            if (!bucketTable || current.version === bucketTable.version) {
+                return;
+            }
+            bucketTable = null;
+            calculateOnServer(bedCount);
+            loadBucketTable(current.bundle_url, current.version);
+        });
+    }
+    
+    // Answer a lookup from the bucket table the way /calculate does, or return null to ask the server
+    function localLookup(bedCount) {
+        if (!bucketTable || !/^\d+$/.test(bedCount)) {
+            return null;
+        }
+        const beds = Number(bedCount);
+        
+        // Last segment starting at or below the bed count (bisect_right - 1, as in BedRangeIndex.find)
+        let low = 0;
+        let high = bucketTable.starts.length;
+        while (low < high) {
+            const mid = (low + high) >> 1;
+            if (bucketTable.starts[mid] <= beds) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+        const pos = low - 1;
+        const stop = pos >= 0 ? bucketTable.stops[pos] : undefined;
+        if (pos < 0 || (stop !== null && beds >= stop)) {
+            return { error: 'Could not determine requirements for the given bed count' };
+        }
+        return Object.assign({ bed_count: beds }, bucketTable.buckets[pos]);
+    }
+    
     // Handle form submission
     $('#cssdForm').on('submit', function(e) {
         e.preventDefault();
@@ -16,17 +82,34 @@ $(document).ready(function() {
             return;
         }
         
+        // Answer instantly from the bucket table when it is available
+        const localResponse = localLookup(bedCount);
+        if (localResponse) {
+            if (localResponse.error) {
+                showError(localResponse.error);
+            } else {
+                displayResults(localResponse);
+            }
+            checkVersion(bedCount);
+            return;
+        }
+        
+        calculateOnServer(bedCount);
+    });
+    
+    // Function to request the requirements from the server
+    function calculateOnServer(bedCount) {
         // Show loading indicator
-        const submitBtn = $(this).find('button[type="submit"]');
+        const submitBtn = $('#cssdForm').find('button[type="submit"]');
         const originalBtnText = submitBtn.html();
         submitBtn.html('<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Calculating...');
         submitBtn.prop('disabled', true);
         
-        // Send the form data to the server
+        // Send the bed count to the server (GET so the browser can cache and revalidate it)
         $.ajax({
             url: '/calculate',
-            type: 'POST',
-            data: $(this).serialize(),
+            type: 'GET',
+            data: { bed_count: bedCount },
             success: function(response) {
                 // Reset button
                 submitBtn.html(originalBtnText);
@@ -50,7 +133,7 @@ $(document).ready(function() {
                 showError('An error occurred while communicating with the server. Please try again.');
             }
         });
-    });
+    }
     
     // Function to display results
     function displayResults(data) {
@@ -0,0 +1,105 @@
+import json
+
+DEFAULT_BATCH_MAX_ITEMS = 10000
+
+
+class BatchRequestError(ValueError):
+    """Raised when a batch request body is malformed or too large."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_bed_count(value):
+    """
+    Convert a bed count from a request to a positive int, raising ValueError otherwise.
+    """
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError("Please enter a valid number of beds")
+    try:
+        bed_count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Please enter a valid number of beds")
+    if bed_count <= 0:
+        raise ValueError("Please enter a valid positive number of beds")
+    return bed_count
+
+
+def parse_batch_request(payload, max_items=DEFAULT_BATCH_MAX_ITEMS):
+    """
+    Normalise a batch request body into a list of (facility_id, raw_bed_count) pairs.
+
+    Accepts either {"bed_counts": [10, 250, ...]} or
+    {"facilities": [{"id": "F1", "bed_count": 10}, ...]}.
+    """
+    if not isinstance(payload, dict):
+        raise BatchRequestError("Request body must be a JSON object")
+
+    if 'facilities' in payload:
+        facilities = payload['facilities']
+        if not isinstance(facilities, list):
+            raise BatchRequestError("'facilities' must be a list")
+        items = []
+        for facility in facilities:
+            if not isinstance(facility, dict):
+                raise BatchRequestError("Each facility must be an object with 'id' and 'bed_count'")
+            items.append((facility.get('id'), facility.get('bed_count')))
+    elif 'bed_counts' in payload:
+        bed_counts = payload['bed_counts']
+        if not isinstance(bed_counts, list):
+            raise BatchRequestError("'bed_counts' must be a list")
+        items = [(None, bed_count) for bed_count in bed_counts]
+    else:
+        raise BatchRequestError("Request must contain 'bed_counts' or 'facilities'")
+
+    if len(items) > max_items:
+        raise BatchRequestError(f"Batch too large: {len(items)} items (limit {max_items})", status=413)
+    return items
+
+
+def batch_result(index, facility_id, raw_bed_count):
+    """
+    Resolve one batch item. Returns (result, bucket) where bucket is the index
+    position of the shared payload, or None if the item could not be resolved.
+    """
+    result = {}
+    if facility_id is not None:
+        result['facility_id'] = facility_id
+
+    try:
+        bed_count = parse_bed_count(raw_bed_count)
+    except ValueError as e:
+        result['bed_count'] = raw_bed_count
+        result['error'] = str(e)
+        return result, None
+
+    result['bed_count'] = bed_count
+    bucket = index.find(bed_count)
+    if bucket is None:
+        result['error'] = "Could not determine requirements for the given bed count"
+    else:
+        result['bucket'] = str(bucket)
+    return result, bucket
+
+
+def iter_batch_json(index, items, version=None):
+    """
+    Stream a batch response as JSON text chunks.
+
+    Results reference shared bucket payloads by key instead of repeating them;
+    each referenced payload is serialized once in the trailing "buckets" object.
+    """
+    yield '{"version": %s, "results": [' % json.dumps(version)
+
+    used_buckets = set()
+    for position, (facility_id, raw_bed_count) in enumerate(items):
+        result, bucket = batch_result(index, facility_id, raw_bed_count)
+        if bucket is not None:
+            used_buckets.add(bucket)
+        yield (', ' if position else '') + json.dumps(result)
+
+    yield '], "buckets": {'
+    for position, bucket in enumerate(sorted(used_buckets)):
+        yield (', ' if position else '') + '"%d": %s' % (bucket, index.payload(bucket).decode())
+    yield '}}'
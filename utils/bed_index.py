@@ -0,0 +1,88 @@
+from bisect import bisect_right
+import json
+import math
+
+
+class BedRangeIndex:
+    """
+    Compiled, read-only lookup from a bed count to its precomputed requirements.
+
+    Bed counts are whole numbers. A workbook range "a-b" covers a..b inclusive,
+    i.e. the half-open interval [a, b + 1). Where consecutive ranges share a
+    boundary ("0-20", "20-30") the lower range owns it, so "20-30" effectively
+    starts at 21. Each range is also serialized to JSON once, so responses
+    only splice in the bed_count.
+    """
+
+    __slots__ = ('starts', 'stops', 'ranges', 'payload_json')
+
+    def __init__(self, starts, stops, ranges):
+        self.starts = tuple(starts)
+        self.stops = tuple(stops)
+        self.ranges = tuple(ranges)
+        # Serialized payload without its opening brace, ready to follow a bed_count member
+        self.payload_json = tuple(json.dumps(bed_range.to_dict(), separators=(',', ':')).encode()[1:]
+                                  for bed_range in self.ranges)
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def find(self, bed_count):
+        """
+        Return the position of the segment containing bed_count, or None.
+        """
+        pos = bisect_right(self.starts, bed_count) - 1
+        if pos >= 0 and bed_count < self.stops[pos]:
+            return pos
+        return None
+
+    def lookup(self, bed_count):
+        """
+        Return the BedRange for bed_count, or None.
+        """
+        pos = self.find(bed_count)
+        return self.ranges[pos] if pos is not None else None
+
+    def payload(self, pos):
+        """
+        Return the serialized payload of the segment at pos (without bed_count).
+        """
+        return b'{' + self.payload_json[pos]
+
+    def response_json(self, pos, bed_count):
+        """
+        Return the serialized requirements for bed_count in the segment at pos.
+        """
+        return b'{"bed_count":%d,' % bed_count + self.payload_json[pos]
+
+    def requirements(self, bed_count):
+        """
+        Return the requirements dictionary for bed_count, or None if it is out of range.
+        """
+        bed_range = self.lookup(bed_count)
+        if bed_range is None:
+            return None
+        return {'bed_count': bed_count, **bed_range.to_dict()}
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """
+        Compile an index from a sequence of BedRange objects.
+        Overlaps are resolved in favour of the range with the lower upper bound.
+        """
+        ordered = sorted(ranges, key=lambda r: (_upper(r), r.min_beds))
+        starts, stops, kept = [], [], []
+        previous_stop = -math.inf
+        for bed_range in ordered:
+            stop = _upper(bed_range) + 1
+            start = max(bed_range.min_beds, previous_stop)
+            if start < stop:
+                starts.append(start)
+                stops.append(stop)
+                kept.append(bed_range)
+                previous_stop = stop
+        return cls(starts, stops, kept)
+
+
+def _upper(bed_range):
+    return math.inf if bed_range.max_beds is None else bed_range.max_beds
@@ -0,0 +1,143 @@
+"""
+Static bucket table that lets the page answer lookups without the server.
+
+The compiled bed-range index is only a few kilobytes, so each data version is
+written once as a gzip-compressed JSON file under static/data/ holding the
+segment starts and stops and every bucket's /calculate payload:
+
+    {"version": "...", "starts": [...], "stops": [..., null], "buckets": [{...}, ...]}
+
+The file name carries the data version and never changes, so it is served
+with immutable cache headers. The page loads it once and bisects it locally,
+falling back to /calculate when the table does not match the data version the
+server is serving.
+
+Build at deploy time (after the snapshot or shared data file) with:
+
+    python -m utils.bundle
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from utils.models import range_bound
+
+DEFAULT_BUNDLE_DIR = Path(__file__).parent.parent / "static" / "data"
+
+BUNDLE_PREFIX = "cssd_buckets-"
+
+# Bundles of recent versions kept for pages rendered before a reload
+KEEP_BUNDLES = 5
+
+# Seconds a bundle may be cached; its name changes with every data version
+BUNDLE_MAX_AGE = 365 * 24 * 3600
+
+
+def bundle_dir():
+    return Path(os.environ.get("CSSD_BUNDLE_DIR", DEFAULT_BUNDLE_DIR))
+
+
+def bundle_file(version, directory=None):
+    """
+    Return the bundle path of a data version, or None if version is not a data version string.
+    """
+    if not isinstance(version, str) or not re.fullmatch(r'[0-9a-f]{12}', version):
+        return None
+    return Path(directory or bundle_dir()) / f"{BUNDLE_PREFIX}{version}.json.gz"
+
+
+def bundle_json(data):
+    """
+    Serialize the bucket table of a data set. Bucket payloads are the ones
+    /calculate sends, copied byte for byte from the compiled index.
+    """
+    index = data['index']
+    head = json.dumps({
+        'version': data.get('version'),
+        'starts': [range_bound(start) for start in index.starts],
+        'stops': [range_bound(stop) for stop in index.stops]
+    }, separators=(',', ':')).encode()
+    buckets = b','.join(index.payload(pos) for pos in range(len(index)))
+    return head[:-1] + b',"buckets":[' + buckets + b']}'
+
+
+def write_bundle(data, directory=None):
+    """
+    Atomically write the compressed bucket table of data and prune old bundles.
+    Returns the path of the bundle.
+    """
+    path = bundle_file(data.get('version'), directory)
+    if path is None:
+        raise ValueError(f"Cannot bundle data version {data.get('version')!r}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(gzip.compress(bundle_json(data), compresslevel=9, mtime=0))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    logging.info(f"Wrote CSSD bucket table {path} (version {data.get('version')})")
+    _prune(path.parent)
+    return path
+
+
+def bundle_for(data):
+    """
+    Return the bundle path of a data set, writing it on first use; None for
+    mock data or if it cannot be written (the page then uses /calculate).
+    """
+    if 'bundle' not in data:
+        path = None
+        if not data.get('is_mock') and bundle_file(data.get('version')) is not None:
+            path = bundle_file(data['version'])
+            if not path.is_file():
+                try:
+                    path = write_bundle(data)
+                except OSError as e:
+                    logging.warning(f"Could not write CSSD bucket table: {e}")
+                    path = None
+        data['bundle'] = path
+    return data['bundle']
+
+
+def _prune(directory):
+    try:
+        bundles = sorted(directory.glob(f"{BUNDLE_PREFIX}*.json.gz"), key=lambda path: path.stat().st_mtime,
+                         reverse=True)
+    except OSError:
+        return
+    for path in bundles[KEEP_BUNDLES:]:
+        try:
+            path.unlink()
+        except OSError as e:
+            logging.debug(f"Could not prune bucket table {path}: {e}")
+
+
+def main(argv=None):
+    from utils.excel_parser import DEFAULT_EXCEL_FILE
+    from utils.snapshot import load_cached_cssd_data
+
+    parser = argparse.ArgumentParser(description="Build the static CSSD bucket table for the page.")
+    parser.add_argument('--workbook', default=DEFAULT_EXCEL_FILE, help="Path to the planning workbook")
+    parser.add_argument('--output-dir', default=bundle_dir(), help="Directory of the bucket tables")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        data = load_cached_cssd_data(args.workbook)
+    except Exception as e:
+        parser.exit(1, f"Workbook could not be parsed; no bucket table written\n{e}\n")
+    path = write_bundle(data, args.output_dir)
+    print(f"CSSD bucket table version {data['version']} ready at {path}")
+
+
+if __name__ == '__main__':
+    main()
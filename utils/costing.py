@@ -0,0 +1,131 @@
+import numpy as np
+
+from utils.models import number
+
+
+class CostMatrix:
+    """
+    Bucket x equipment matrices of quantity and unit price for vectorized costing.
+
+    Rows follow the compiled BedRangeIndex segments and columns the equipment
+    names in first-seen order. Missing or non-numeric quantities and prices
+    are stored as 0, with a mask recording lines that have no unit price.
+    """
+
+    def __init__(self, index):
+        self.starts = np.asarray(index.starts, dtype=float)
+        self.stops = np.asarray(index.stops, dtype=float)
+        self.bed_ranges = [bed_range.original_range for bed_range in index.ranges]
+
+        names = {}
+        for bed_range in index.ranges:
+            for item in bed_range.equipment:
+                names.setdefault(item.name, len(names))
+        self.equipment_names = list(names)
+
+        shape = (len(index.ranges), len(names))
+        self.quantity = np.zeros(shape, dtype=np.int64)
+        self.unit_price = np.zeros(shape, dtype=float)
+        self.unpriced = np.zeros(shape, dtype=bool)
+        self.line_cost = np.zeros(shape, dtype=float)
+        self.official_min = np.full(shape[0], np.nan)
+        self.official_max = np.full(shape[0], np.nan)
+
+        for row, bed_range in enumerate(index.ranges):
+            for item in bed_range.equipment:
+                col = names[item.name]
+                quantity = number(item.quantity)
+                self.quantity[row, col] = int(quantity or 0)
+                self.unit_price[row, col] = item.unit_price or 0
+                self.unpriced[row, col] = item.unit_price is None and bool(quantity)
+                self.line_cost[row, col] = item.cost
+            self.official_min[row] = number(bed_range.budget.min, np.nan)
+            self.official_max[row] = number(bed_range.budget.max, np.nan)
+
+        self.bucket_total = self.line_cost.sum(axis=1)
+
+        # -1 below the official minimum, 0 within the range, 1 above the maximum
+        with np.errstate(invalid='ignore'):
+            self.budget_status = np.where(self.bucket_total < self.official_min, -1,
+                                          np.where(self.bucket_total > self.official_max, 1, 0))
+        self.budget_known = ~(np.isnan(self.official_min) & np.isnan(self.official_max))
+
+    def buckets_for(self, bed_counts):
+        """
+        Map an array of bed counts to bucket rows, with -1 for unresolved counts.
+        """
+        bed_counts = np.asarray(bed_counts, dtype=float)
+        rows = np.searchsorted(self.starts, bed_counts, side='right') - 1
+        valid = (rows >= 0) & (bed_counts < self.stops[np.clip(rows, 0, None)]) & (bed_counts > 0)
+        return np.where(valid, rows, -1)
+
+    def rollup(self, bed_counts):
+        """
+        Aggregate equipment quantities and costs over a portfolio of bed counts.
+        """
+        rows = self.buckets_for(bed_counts)
+        resolved = rows[rows >= 0]
+        counts = np.bincount(resolved, minlength=len(self.bed_ranges))
+
+        equipment_quantity = counts @ self.quantity
+        equipment_cost = counts @ self.line_cost
+        unpriced_lines = counts @ self.unpriced.astype(np.int64)
+
+        official_min = np.nansum(counts * self.official_min)
+        official_max = np.nansum(counts * self.official_max)
+        known = counts * self.budget_known
+
+        used = np.nonzero(counts)[0]
+        return {
+            'facilities': int(rows.size),
+            'resolved': int(resolved.size),
+            'unresolved': int(rows.size - resolved.size),
+            'total_cost': _plain(equipment_cost.sum()),
+            'official_budget': {'min': _plain(official_min), 'max': _plain(official_max)},
+            'budget_status': {
+                'below_min': int(known[self.budget_status == -1].sum()),
+                'within': int(known[self.budget_status == 0].sum()),
+                'above_max': int(known[self.budget_status == 1].sum()),
+                'unknown': int((counts * ~self.budget_known).sum())
+            },
+            'equipment': [
+                {
+                    'name': name,
+                    'quantity': int(equipment_quantity[col]),
+                    'total_cost': _plain(equipment_cost[col]),
+                    'unpriced_lines': int(unpriced_lines[col])
+                }
+                for col, name in enumerate(self.equipment_names)
+                if equipment_quantity[col]
+            ],
+            'buckets': [
+                {
+                    'bed_range': self.bed_ranges[row],
+                    'facilities': int(counts[row]),
+                    'calculated_total': _plain(self.bucket_total[row]),
+                    'official_min_budget': _plain(self.official_min[row]),
+                    'official_max_budget': _plain(self.official_max[row])
+                }
+                for row in used
+            ]
+        }
+
+
+def cost_matrix_for(data):
+    """
+    Return the CostMatrix for a data set, building it on first use.
+    """
+    matrix = data.get('cost_matrix')
+    if matrix is None:
+        matrix = data['cost_matrix'] = CostMatrix(data['index'])
+    return matrix
+
+
+def _plain(value):
+    """
+    Convert a NumPy scalar to a JSON-friendly int/float (None for NaN).
+    """
+    value = float(value)
+    if np.isnan(value):
+        return None
+    return int(value) if value.is_integer() else value
@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from utils.datasets import data_dir_stat, dataset_name, ingest_datasets
+from utils.excel_parser import DEFAULT_EXCEL_FILE, create_mock_data, mock_data_allowed
+from utils.shared_data import load_shared_cssd_data
+from utils.snapshot import load_cached_cssd_data
+
+
+class CSSDDataStore:
+    """
+    Holds the active compiled CSSD data and swaps in new versions without a restart.
+
+    Readers call current() once per request and keep that reference, so an
+    in-flight request always sees one consistent data set. Reloads parse off
+    the request path and only replace the active data if the result validates;
+    a failed parse keeps serving the previous version.
+
+    With a shared_file the data is served from a memory-mapped file shared by
+    all workers (see utils.shared_data) instead of a per-process copy.
+
+    With data_dirs, every workbook in those directories is also ingested as a
+    named data set (see utils.datasets). The main workbook is always available
+    under its own data set name.
+    """
+
+    def __init__(self, excel_file=None, snapshot_file=None, shared_file=None, data_dirs=None):
+        self.excel_file = Path(excel_file or DEFAULT_EXCEL_FILE)
+        self.snapshot_file = snapshot_file
+        self.shared_file = shared_file
+        self.data_dirs = [Path(directory) for directory in data_dirs or ()]
+        self.default_dataset = dataset_name(self.excel_file)
+        self._data = None
+        self._datasets = {}
+        self._loading_thread = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.loaded_at = None
+        self.last_error = None
+        self._last_stat = None
+
+    def current(self, dataset=None):
+        """
+        Return the active main data set, or the named data set if dataset is
+        given (None if nothing has been loaded or the name is unknown).
+        """
+        if dataset is None:
+            return self._data
+        return self._datasets.get(dataset)
+
+    def datasets(self):
+        """
+        Return the versions of all named data sets by name.
+        """
+        return {name: data.get('version') for name, data in sorted(self._datasets.items())}
+
+    def load(self):
+        """
+        Load the initial data set. A workbook that cannot be loaded raises and
+        is reported by status() and health(); only with CSSD_ALLOW_MOCK_DATA=1
+        (development) does the store start on mock data instead. Mock data is
+        rejected by later reloads.
+        """
+        with self._reload_lock:
+            self._loading_thread = threading.get_ident()
+            try:
+                self._last_stat = self._workbook_stat()
+                error = None
+                try:
+                    data = self._load_data()
+                except Exception as e:
+                    if not mock_data_allowed():
+                        self.last_error = str(e)
+                        raise
+                    logging.warning(f"CSSD_ALLOW_MOCK_DATA is set, serving mock data: {e}")
+                    data, error = create_mock_data(), str(e)
+                self._swap(data, self._load_datasets())
+                self.last_error = error
+            finally:
+                self._loading_thread = None
+        return self._data
+
+    def reload(self, force=False):
+        """
+        Reparse the workbook and swap in the result if it is valid.
+        Returns True if a new data version became active.
+        """
+        with self._reload_lock:
+            self._loading_thread = threading.get_ident()
+            try:
+                return self._reload(force)
+            finally:
+                self._loading_thread = None
+
+    def _reload(self, force):
+        self._last_stat = self._workbook_stat()
+        try:
+            data = self._load_data(force=force)
+            validate_cssd_data(data)
+            datasets = self._load_datasets(force=force)
+        except Exception as e:
+            self.last_error = str(e)
+            logging.error(f"CSSD data reload failed, keeping version {self.version}: {e}")
+            return False
+
+        if self._data is not None and data.get('version') == self.version:
+            versions = {name: dataset.get('version') for name, dataset in datasets.items()}
+            versions[self.default_dataset] = self.version
+            if dict(sorted(versions.items())) == self.datasets():
+                self.last_error = None
+                return False
+            # Only other data sets changed; keep the active main data
+            self._swap(self._data, datasets)
+            logging.info(f"CSSD data sets reloaded ({len(self._datasets)} active)")
+            return True
+
+        self._swap(data, datasets)
+        logging.info(f"CSSD data reloaded (version {self.version})")
+        return True
+
+    @property
+    def version(self):
+        return self._data.get('version') if self._data else None
+
+    def status(self):
+        """
+        Return a JSON-serializable summary of the active data set.
+        """
+        index = self._data.get('index') if self._data else None
+        return {
+            'version': self.version,
+            'workbook': str(self.excel_file),
+            'loaded_at': self.loaded_at,
+            'buckets': len(index) if index is not None else 0,
+            'is_mock': bool(self._data and self._data.get('is_mock')),
+            'shared': bool(self._data and self._data.get('shared')),
+            'datasets': self.datasets(),
+            'schema_issues': list(self._data.get('schema_issues', ())) if self._data else [],
+            'watching': self._watcher is not None and self._watcher.is_alive(),
+            'last_error': self.last_error
+        }
+
+    def health(self):
+        """
+        Return (healthy, summary): healthy only while workbook-derived data is being served.
+        """
+        healthy = self._data is not None and not self._data.get('is_mock')
+        return healthy, {
+            'status': 'ok' if healthy else 'unavailable',
+            'version': self.version,
+            'is_mock': bool(self._data and self._data.get('is_mock')),
+            'error': self.last_error
+        }
+
+    def start_watcher(self, interval=5.0):
+        """
+        Poll the workbook's mtime and size every interval seconds in a daemon
+        thread and reload when they change.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                         name='cssd-data-watcher', daemon=True)
+        self._watcher.start()
+
+    def restart_after_fork(self, interval=5.0):
+        """
+        Re-create thread state in a forked worker (e.g. gunicorn --preload),
+        since neither the watcher thread nor a held lock survives fork.
+        """
+        if self._loading_thread == threading.get_ident():
+            return  # A data set parser forked by our own ingest, not a server worker
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self.start_watcher(interval)
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            stat = self._workbook_stat()
+            if stat is not None and stat != self._last_stat:
+                logging.info("Detected change to the CSSD workbooks, reloading data")
+                self.reload()
+
+    def _load_datasets(self, force=False):
+        if not self.data_dirs:
+            return {}
+        # The main workbook's first sheet is the main data, loaded by _load_data
+        return ingest_datasets(self.data_dirs, force=force, main_workbook=self.excel_file)
+
+    def _load_data(self, force=False):
+        if self.shared_file:
+            return load_shared_cssd_data(self.excel_file, self.snapshot_file, self.shared_file, force=force)
+        return load_cached_cssd_data(self.excel_file, self.snapshot_file, force=force)
+
+    def _workbook_stat(self):
+        try:
+            stat = os.stat(self.excel_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, data_dir_stat(self.data_dirs)
+
+    def _swap(self, data, datasets):
+        # Single reference assignments, so readers see either the old or the new data
+        datasets = dict(datasets)
+        if data is not None:
+            datasets[self.default_dataset] = data
+        self._datasets = datasets
+        self._data = data
+        self.loaded_at = time.time()
+        self.last_error = None
+
+
+def validate_cssd_data(data):
+    """
+    Raise ValueError if data is not a usable, workbook-derived data set.
+    """
+    if not data or data.get('is_mock'):
+        raise ValueError("Workbook could not be parsed")
+    index = data.get('index')
+    if index is None or len(index) == 0:
+        raise ValueError("Workbook produced no bed ranges")
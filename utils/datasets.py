@@ -0,0 +1,195 @@
+"""
+Named CSSD data sets ingested in parallel from directories of workbooks.
+
+Every planning sheet of every workbook in the data directories becomes a
+data set, named after the workbook and, for sheets after the first, the sheet:
+
+    static/data/cssd_planning.xlsx        Sheet1  ->  cssd-planning
+                                          Sheet2  ->  cssd-planning/sheet2
+    attached_assets/Rates Kerala.xlsx     Sheet1  ->  rates-kerala
+
+Sheets are parsed independently in a process pool, so ingest time scales with
+the number of cores rather than the number of files. The parsed data sets of
+each workbook are cached in instance/datasets/ with the same fingerprint check
+as the main snapshot, so only changed workbooks are parsed again.
+"""
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from utils.excel_parser import load_cssd_data
+from utils.sheet_schema import SheetSchemaError
+from utils.snapshot import SNAPSHOT_FORMAT, data_version, read_snapshot, workbook_fingerprint, write_snapshot
+
+ROOT = Path(__file__).parent.parent
+
+DEFAULT_DATASET_CACHE_DIR = ROOT / "instance" / "datasets"
+
+
+def data_dirs():
+    """
+    Return the workbook directories configured by CSSD_DATA_DIR (separated by
+    os.pathsep, default static/data). Relative paths are resolved from the project root.
+    """
+    configured = os.environ.get("CSSD_DATA_DIR", "static/data")
+    return [path if path.is_absolute() else ROOT / path
+            for path in map(Path, configured.split(os.pathsep)) if str(path)]
+
+
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-')
+
+
+def dataset_name(excel_file, sheet=None):
+    """
+    Return the data set name of a workbook sheet; sheet None means the first sheet.
+    """
+    name = slugify(Path(excel_file).stem)
+    return name if sheet is None else f"{name}/{slugify(sheet)}"
+
+
+def discover_workbooks(directories):
+    """
+    Return the .xlsx files in directories, skipping Excel lock files and missing directories.
+    """
+    workbooks = []
+    for directory in directories:
+        if not Path(directory).is_dir():
+            continue
+        workbooks.extend(sorted(path for path in Path(directory).glob("*.xlsx")
+                                if not path.name.startswith(('~$', '.'))))
+    return workbooks
+
+
+def list_sheets(excel_file):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_file, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def sheet_version(fingerprint, sheet=None):
+    """
+    Return the data version of a workbook sheet; the first sheet keeps the workbook version.
+    """
+    if sheet is None:
+        return data_version(fingerprint)
+    return hashlib.sha256(f"{SNAPSHOT_FORMAT}:{fingerprint['sha256']}:{sheet}".encode()).hexdigest()[:12]
+
+
+def _parse_sheet(excel_file, sheet):
+    # Runs in a pool worker; the compiled data (or the schema error) is pickled back to the parent
+    try:
+        return load_cssd_data(excel_file, sheet=sheet)
+    except SheetSchemaError as e:
+        return e
+
+
+def parse_sheets(units, max_workers=None):
+    """
+    Parse (excel_file, sheet) pairs, in a process pool when more than one worker can be used.
+    Returns the data of each pair in order, or the SheetSchemaError of sheets
+    that do not match the planning schema.
+    """
+    workers = min(len(units), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [_parse_sheet(*unit) for unit in units]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_sheet, *zip(*units)))
+
+
+def ingest_datasets(directories=None, cache_dir=None, max_workers=None, force=False, main_workbook=None):
+    """
+    Return {name: data} for every planning sheet of the workbooks in directories,
+    parsing only workbooks whose cached data sets are missing or outdated.
+    The first sheet of main_workbook is left out, since the caller already
+    loads it as its main data set; its other sheets are ingested as usual.
+    """
+    main_workbook = Path(main_workbook).resolve() if main_workbook else None
+    directories = data_dirs() if directories is None else directories
+    cache_dir = Path(cache_dir or DEFAULT_DATASET_CACHE_DIR)
+    for directory in directories:
+        if not Path(directory).is_dir():
+            logging.warning(f"CSSD data directory {directory} does not exist")
+    datasets = {}
+    stale = []
+    seen = set()
+
+    for excel_file in discover_workbooks(directories):
+        name = dataset_name(excel_file)
+        if name in seen:
+            logging.warning(f"Skipping {excel_file}: data set '{name}' is already defined")
+            continue
+        seen.add(name)
+
+        cache_file = cache_dir / f"{name}.pickle"
+        first = 1 if Path(excel_file).resolve() == main_workbook else 0
+        try:
+            cached = None if force else read_snapshot(cache_file)
+            fingerprint = workbook_fingerprint(excel_file, cached[0] if cached else None)
+        except OSError as e:
+            logging.error(f"Could not read workbook {excel_file}: {e}")
+            continue
+        # The cache also records whether the first sheet was left out
+        fingerprint['first_sheet'] = first
+        if cached and cached[0]['sha256'] == fingerprint['sha256'] and cached[0].get('first_sheet', 0) == first:
+            datasets.update(cached[1])
+            continue
+
+        try:
+            sheets = list_sheets(excel_file)
+        except Exception as e:
+            logging.error(f"Could not open workbook {excel_file}: {e}")
+            continue
+        stale.append((excel_file, fingerprint, cache_file, sheets, first))
+
+    units = [(excel_file, sheet) for excel_file, _, _, sheets, first in stale for sheet in sheets[first:]]
+    results = iter(parse_sheets(units, max_workers))
+
+    for excel_file, fingerprint, cache_file, sheets, first in stale:
+        parsed = {}
+        failed = False
+        for position, sheet in enumerate(sheets[first:], first):
+            data = next(results)
+            if isinstance(data, SheetSchemaError):
+                if data.header_found:
+                    failed = True
+                    logging.error(f"Skipping invalid planning sheet of {excel_file}: {data}")
+                else:
+                    logging.info(f"Sheet '{sheet}' of {excel_file} is not a planning sheet, skipping")
+                continue
+            key = None if position == 0 else sheet
+            data['version'] = sheet_version(fingerprint, key)
+            data['modified'] = fingerprint['mtime_ns'] / 1e9
+            parsed[dataset_name(excel_file, key)] = data
+
+        datasets.update(parsed)
+        if failed:
+            continue  # Not cached, so the error is reported again until the workbook is fixed
+        try:
+            write_snapshot(parsed, fingerprint, cache_file)
+        except OSError as e:
+            logging.warning(f"Could not cache CSSD data sets of {excel_file}: {e}")
+
+    logging.info(f"Ingested {len(datasets)} CSSD data sets ({len(units)} sheets parsed)")
+    return datasets
+
+
+def data_dir_stat(directories):
+    """
+    Return a value that changes whenever a workbook in directories is added, removed or modified.
+    """
+    stats = []
+    for excel_file in discover_workbooks(directories):
+        try:
+            stat = os.stat(excel_file)
+        except OSError:
+            continue
+        stats.append((str(excel_file), stat.st_mtime_ns, stat.st_size))
+    return tuple(stats)
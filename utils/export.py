@@ -0,0 +1,195 @@
+"""
+CSV and XLSX exports of CSSD requirements for one or many bed counts.
+
+Reports have one row per facility and equipment line. CSV is generated in
+chunks and streamed while it is written; XLSX is written row by row with
+openpyxl's write-only mode, so neither format holds the whole report in
+memory. Finished files are cached on disk by (data version, data set,
+format, input), shared by all workers, so repeated downloads are served
+straight from the cache.
+"""
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from utils.batch import parse_bed_count
+
+DEFAULT_EXPORT_DIR = Path(__file__).parent.parent / "instance" / "exports"
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+EXPORT_COLUMNS = [
+    'Facility', 'Bed Count', 'Bed Range', 'CSSD Area (sq ft)', 'Autoclave Model', 'Autoclave Quantity',
+    'Equipment', 'Specification', 'Quantity', 'Unit Price', 'Total Price', 'Budget Min', 'Budget Max', 'Error'
+]
+
+
+def bucket_rows_for(data, bucket):
+    """
+    Return the report rows of a bucket without the facility and bed count columns, built on first use.
+    """
+    rows = data.setdefault('export_rows', {})
+    if bucket not in rows:
+        bed_range = data['index'].ranges[bucket]
+        head = (bed_range.original_range, bed_range.area, bed_range.autoclave_model, bed_range.autoclave_quantity)
+        tail = (bed_range.budget.min, bed_range.budget.max, None)
+        rows[bucket] = [
+            head + (item.name, item.specification, item.quantity, item.unit_price, item.total_price) + tail
+            for item in bed_range.equipment
+        ] or [head + (None,) * 5 + tail]
+    return rows[bucket]
+
+
+def export_rows(data, items):
+    """
+    Yield report rows for (facility_id, raw_bed_count) items.
+    """
+    index = data['index']
+    blank = (None,) * (len(EXPORT_COLUMNS) - 3)
+    for facility_id, raw_bed_count in items:
+        facility_id = _scalar(facility_id)
+        try:
+            bed_count = parse_bed_count(raw_bed_count)
+        except ValueError as e:
+            yield (facility_id, _scalar(raw_bed_count)) + blank + (str(e),)
+            continue
+        bucket = index.find(bed_count)
+        if bucket is None:
+            yield (facility_id, bed_count) + blank + ("Could not determine requirements for the given bed count",)
+            continue
+        for row in bucket_rows_for(data, bucket):
+            yield (facility_id, bed_count) + row
+
+
+def _scalar(value):
+    # Objects and lists from a JSON body become their JSON text, which both formats can write
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value)
+
+
+def iter_csv(rows, chunk_rows=500):
+    """
+    Yield the CSV report as text chunks of about chunk_rows rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for position, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if position % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(rows, path):
+    """
+    Write the XLSX report to path with a write-only (streaming) workbook.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("CSSD Requirements")
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def export_key(version, dataset, export_format, items):
+    """
+    Return the cache key of an export request. Bed counts are keyed by their
+    parsed value, and invalid ones by their raw JSON value with an error marker,
+    so inputs that look alike as text (25.0 and "25.0") never share a file.
+    """
+    request = [version, dataset, export_format, [[facility_id, _bed_count_key(bed_count)]
+                                                 for facility_id, bed_count in items]]
+    return hashlib.sha256(json.dumps(request, default=repr).encode()).hexdigest()[:32]
+
+
+def _bed_count_key(raw_bed_count):
+    try:
+        return parse_bed_count(raw_bed_count)
+    except ValueError:
+        return ['invalid', raw_bed_count]
+
+
+class ExportCache:
+    """
+    Directory of finished export files named by cache key, pruned to the max_files most recently used.
+    """
+
+    def __init__(self, directory=None, max_files=None):
+        self.directory = Path(directory or os.environ.get("CSSD_EXPORT_CACHE_DIR", DEFAULT_EXPORT_DIR))
+        self.max_files = max_files or int(os.environ.get("CSSD_EXPORT_CACHE_FILES", "256"))
+
+    def path(self, key, export_format):
+        return self.directory / f"{key}.{export_format}"
+
+    def get(self, key, export_format):
+        """
+        Return the cached file for key, or None.
+        """
+        path = self.path(key, export_format)
+        try:
+            os.utime(path)  # Mark as recently used for pruning
+        except OSError:
+            return None
+        return path
+
+    def tee(self, key, export_format, chunks):
+        """
+        Yield text chunks while writing them to the cache; the file is only
+        published if the whole export was generated.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, self.path(key, export_format))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.prune()
+
+    def store(self, key, export_format, write):
+        """
+        Create the cached file for key by calling write(path) on a temporary file.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, self.path(key, export_format))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.prune()
+        return self.path(key, export_format)
+
+    def prune(self):
+        try:
+            files = sorted((entry for entry in os.scandir(self.directory)
+                            if entry.is_file() and not entry.name.endswith('.tmp')),
+                           key=lambda entry: entry.stat().st_mtime, reverse=True)
+        except OSError:
+            return
+        for entry in files[self.max_files:]:
+            try:
+                os.unlink(entry.path)
+            except OSError as e:
+                logging.debug(f"Could not prune export {entry.path}: {e}")
@@ -0,0 +1,356 @@
+"""
+Persistent history of /calculate requests.
+
+Requests never touch the database: record() appends to an in-memory queue
+and a background thread inserts the queued rows in batches. Each batch also
+upserts per-day, per-bed-range counters into a small rollup table, so usage
+statistics are read from the rollup rather than by scanning the history.
+
+The database comes from DATABASE_URL (e.g. PostgreSQL on Replit) through a
+pooled SQLAlchemy engine, falling back to a local SQLite file. Models are
+declared with Flask-SQLAlchemy, but the engine is created directly rather than
+bound to the Flask app, so the app can set history up on first use instead of
+paying for it in every worker's startup.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from utils.models import line_cost, number
+
+DEFAULT_SQLITE_FILE = Path(__file__).parent.parent / "instance" / "cssd_history.db"
+
+db = SQLAlchemy()
+
+# Queued after the last row to make the writer thread exit
+_STOP = object()
+
+
+class CalculationRecord(db.Model):
+    """One answered /calculate request."""
+    __tablename__ = 'calculation_history'
+    __table_args__ = (
+        db.Index('ix_calculation_history_bed_count_id', 'bed_count', 'id'),
+        db.Index('ix_calculation_history_dataset_id', 'dataset', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.Float, nullable=False, index=True)
+    bed_count = db.Column(db.Integer, nullable=False)
+    dataset = db.Column(db.String(120), nullable=False)
+    data_version = db.Column(db.String(32))
+    bed_range = db.Column(db.String(40))
+    cssd_area = db.Column(db.Float)
+    equipment_total = db.Column(db.Float)
+    budget_min = db.Column(db.Float)
+    budget_max = db.Column(db.Float)
+    duration_ms = db.Column(db.Float)
+
+    def to_dict(self):
+        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+
+
+class CalculationStats(db.Model):
+    """Per-day, per-bed-range request counters maintained by the history writer."""
+    __tablename__ = 'calculation_stats'
+
+    day = db.Column(db.String(10), primary_key=True)
+    dataset = db.Column(db.String(120), primary_key=True)
+    bed_range = db.Column(db.String(40), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total_duration_ms = db.Column(db.Float, nullable=False, default=0)
+    max_duration_ms = db.Column(db.Float, nullable=False, default=0)
+
+
+def database_url():
+    """
+    Return DATABASE_URL (normalized for SQLAlchemy) or the local SQLite fallback.
+    """
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        DEFAULT_SQLITE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        return f"sqlite:///{DEFAULT_SQLITE_FILE}"
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def init_history():
+    """
+    Create the pooled engine and any missing tables, and return a HistoryWriter.
+    """
+    url = database_url()
+    if url.startswith("sqlite"):
+        options = {"connect_args": {"timeout": 30}}
+    else:
+        options = {
+            "pool_size": int(os.environ.get("CSSD_DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.environ.get("CSSD_DB_MAX_OVERFLOW", "5")),
+            "pool_recycle": 300,
+            "pool_pre_ping": True
+        }
+    engine = create_engine(url, **options)
+    db.metadata.create_all(engine)
+
+    logging.info(f"Recording calculation history to {engine.url.render_as_string(hide_password=True)}")
+    return HistoryWriter(engine)
+
+
+class HistoryWriter:
+    """
+    Buffers history rows and inserts them in batches from a background thread.
+
+    The thread is started lazily by the first record() in each process, so
+    forked gunicorn workers get their own writer. When the queue is full, new
+    rows are dropped and counted rather than slowing requests down. At exit the
+    thread is stopped and joined, so the batch it holds is written too.
+    """
+
+    def __init__(self, engine, batch_size=None, flush_interval=None, max_queue=None):
+        self.engine = engine
+        self.batch_size = batch_size or int(os.environ.get("CSSD_HISTORY_BATCH_SIZE", "500"))
+        self.flush_interval = flush_interval or float(os.environ.get("CSSD_HISTORY_FLUSH_INTERVAL", "1"))
+        self.max_queue = max_queue or int(os.environ.get("CSSD_HISTORY_QUEUE_SIZE", "10000"))
+        self.written = 0
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def record(self, **row):
+        """
+        Queue one history row without blocking.
+        """
+        if self._pid != os.getpid():
+            self._start()
+        row.setdefault('created_at', time.time())
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logging.warning(f"Calculation history queue full, {self.dropped} rows dropped so far")
+
+    def flush(self, timeout=10):
+        """
+        Wait until every row recorded so far is written, including the batch
+        the writer thread has already taken from the queue.
+        """
+        if self._queue is None:
+            return
+        if self._writer_running():
+            written = threading.Event()
+            try:
+                self._queue.put(written, timeout=timeout)
+            except queue.Full:
+                return
+            written.wait(timeout)
+            return
+        # No writer thread in this process: write from the calling thread
+        while True:
+            rows, _ = self._drain(block=False)
+            if not rows:
+                return
+            self._write(rows)
+
+    def close(self, timeout=10):
+        """
+        Stop the writer thread once it has written everything queued; registered with atexit.
+        """
+        if not self._writer_running():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._pid = None  # A later record() starts a new writer
+
+    def status(self):
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'written': self.written,
+            'dropped': self.dropped
+        }
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked from a process that already used the engine
+                self.engine.dispose(close=False)
+            self._pid = os.getpid()
+            self._queue = queue.Queue(self.max_queue)
+            self._thread = threading.Thread(target=self._run, name='cssd-history-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _writer_running(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            rows, signal = self._drain(block=True)
+            if rows:
+                try:
+                    self._write(rows)
+                except Exception as e:
+                    logging.error(f"Could not write {len(rows)} calculation history rows: {e}")
+            if signal is _STOP:
+                return
+            if signal is not None:
+                signal.set()  # A flush() waiting for the rows queued before it
+
+    def _drain(self, block):
+        # Returns (rows, signal), where signal is a flush event or _STOP that ended the batch
+        rows = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_size:
+            try:
+                if block:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(item, dict):
+                return rows, item
+            rows.append(item)
+        return rows, None
+
+    def _write(self, rows):
+        stats = {}
+        for row in rows:
+            day = datetime.fromtimestamp(row['created_at'], timezone.utc).strftime('%Y-%m-%d')
+            key = (day, row['dataset'], row.get('bed_range') or '')
+            count, total, longest = stats.get(key, (0, 0.0, 0.0))
+            duration = row.get('duration_ms') or 0.0
+            stats[key] = (count + 1, total + duration, max(longest, duration))
+
+        with self.engine.begin() as connection:
+            connection.execute(insert(CalculationRecord), rows)
+            for (day, dataset, bed_range), (count, total, longest) in stats.items():
+                connection.execute(_stats_upsert(connection.dialect.name, {
+                    'day': day, 'dataset': dataset, 'bed_range': bed_range,
+                    'count': count, 'total_duration_ms': total, 'max_duration_ms': longest
+                }))
+        self.written += len(rows)
+
+
+def _stats_upsert(dialect, values):
+    """
+    Return an INSERT ... ON CONFLICT DO UPDATE that adds values to a stats row.
+    """
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    table = CalculationStats.__table__
+    statement = dialect_insert(table).values(**values)
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=['day', 'dataset', 'bed_range'],
+        set_={
+            'count': table.c.count + excluded.count,
+            'total_duration_ms': table.c.total_duration_ms + excluded.total_duration_ms,
+            'max_duration_ms': case((excluded.max_duration_ms > table.c.max_duration_ms,
+                                     excluded.max_duration_ms), else_=table.c.max_duration_ms)
+        }
+    )
+
+
+def query_history(engine, bed_count=None, dataset=None, before_id=None, limit=50):
+    """
+    Return the newest history rows (optionally filtered), older than before_id.
+    Uses keyset pagination over the (filter, id) indexes instead of OFFSET.
+    """
+    statement = select(CalculationRecord).order_by(CalculationRecord.id.desc()).limit(limit)
+    if bed_count is not None:
+        statement = statement.where(CalculationRecord.bed_count == bed_count)
+    if dataset is not None:
+        statement = statement.where(CalculationRecord.dataset == dataset)
+    if before_id is not None:
+        statement = statement.where(CalculationRecord.id < before_id)
+
+    with Session(engine) as session:
+        items = [record.to_dict() for record in session.execute(statement).scalars()]
+    return {
+        'items': items,
+        'next_before_id': items[-1]['id'] if len(items) == limit else None
+    }
+
+
+def usage_stats(engine, days=30, dataset=None):
+    """
+    Summarize request counts and latency per day and per bed range from the rollup table.
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    stats = CalculationStats
+    filters = [stats.day >= since]
+    if dataset is not None:
+        filters.append(stats.dataset == dataset)
+
+    def grouped(connection, column):
+        statement = (select(column, func.sum(stats.count), func.sum(stats.total_duration_ms),
+                            func.max(stats.max_duration_ms))
+                     .where(*filters).group_by(column).order_by(column))
+        return [
+            {'key': key, 'requests': int(count),
+             'mean_duration_ms': total / count if count else None, 'max_duration_ms': longest}
+            for key, count, total, longest in connection.execute(statement)
+        ]
+
+    with engine.connect() as connection:
+        by_day = grouped(connection, stats.day)
+        by_bed_range = grouped(connection, stats.bed_range)
+    return {
+        'since': since,
+        'requests': sum(row['requests'] for row in by_day),
+        'by_day': [{'day': row.pop('key'), **row} for row in by_day],
+        'by_bed_range': [{'bed_range': row.pop('key'), **row} for row in by_bed_range]
+    }
+
+
+def record_calculation(writer, data, dataset, bed_count, pos, duration_ms):
+    """
+    Queue the history row of a /calculate answer for bucket pos. duration_ms is
+    taken by the caller before the history is set up, so first-use setup never
+    counts as request time.
+    """
+    bed_range, area, equipment_total, budget_min, budget_max = bucket_summary(data, pos)
+    writer.record(bed_count=bed_count, dataset=dataset, data_version=data.get('version'),
+                  bed_range=bed_range, cssd_area=area, equipment_total=equipment_total,
+                  budget_min=budget_min, budget_max=budget_max,
+                  duration_ms=duration_ms)
+
+
+def bucket_summary(data, pos):
+    """
+    Return (bed range, area, equipment total, budget min, budget max) of a bucket, built on first use.
+    Summaries are read from the bucket's serialized payload, so a memory-mapped
+    index never decodes its models just to record history.
+    """
+    summaries = data.setdefault('bucket_summaries', {})
+    summary = summaries.get(pos)
+    if summary is None:
+        payload = json.loads(data['index'].payload(pos))
+        summary = summaries[pos] = (
+            payload['bed_range'], number(payload['cssd_area']),
+            sum(line_cost(item['quantity'], item['unit_price'], item['total_price']) for item in payload['equipment']),
+            number(payload['official_budget']['min']), number(payload['official_budget']['max'])
+        )
+    return summary
+
@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+import random
+import time
+
+# Fraction of requests whose per-item detail is logged at DEBUG level
+_detail_sample_rate = 0.0
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format log records as single-line JSON objects for log pipelines.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level=None, fmt=None, sample_rate=None):
+    """
+    Configure the root logger from arguments or the environment.
+
+    CSSD_LOG_LEVEL sets the level (default INFO), CSSD_LOG_FORMAT=json switches
+    to JSON lines, and CSSD_LOG_SAMPLE_RATE (0.0-1.0, default 0) controls how
+    many requests log per-item detail at DEBUG level.
+    """
+    global _detail_sample_rate
+
+    level = (level or os.environ.get('CSSD_LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('CSSD_LOG_FORMAT', 'text')
+    if sample_rate is None:
+        sample_rate = float(os.environ.get('CSSD_LOG_SAMPLE_RATE', '0'))
+    _detail_sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def sample_request_detail():
+    """
+    Return True if this request should log its per-item detail.
+    """
+    return (_detail_sample_rate > 0 and logging.getLogger().isEnabledFor(logging.DEBUG)
+            and random.random() < _detail_sample_rate)
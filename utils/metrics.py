@@ -0,0 +1,62 @@
+import threading
+from bisect import bisect_left
+
+# Latency bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LatencyHistogram:
+    """
+    Per-route request latency histogram rendered in Prometheus text format.
+
+    Counters are kept per process, so with several gunicorn workers each
+    worker reports its own series.
+    """
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        """
+        Record one observation for the label tuple ((name, value), ...).
+        """
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+    def render(self):
+        """
+        Return the histogram in Prometheus text exposition format.
+        """
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+
+        for labels, counts, total in sorted(snapshot):
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_latency = LatencyHistogram(
+    'cssd_request_duration_seconds',
+    'Time spent handling HTTP requests, by route, method and status.'
+)
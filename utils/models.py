@@ -0,0 +1,146 @@
+import math
+import sys
+from dataclasses import dataclass
+from typing import Optional, Union
+
+# Placeholder used in API responses wherever the model holds None
+NOT_SPECIFIED = "Not specified"
+
+
+def _or_not_specified(value):
+    return NOT_SPECIFIED if value is None else value
+
+
+def intern_text(value):
+    """
+    Return value as an interned string so repeated specifications share one object.
+    """
+    return sys.intern(str(value))
+
+
+def is_number(value):
+    """
+    Return True for int and float values, excluding bool and NaN.
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def number(value, default=None):
+    """
+    Return value if it is a number (see is_number), else default.
+    """
+    return value if is_number(value) else default
+
+
+def line_cost(quantity, unit_price, total_price=None):
+    """
+    The cost of an equipment line as the results table computes it: quantity x
+    unit price, else the workbook total, else 0. Takes model fields as well as
+    payload values ("Not specified" and text quantities count as missing).
+    """
+    if is_number(quantity) and is_number(unit_price):
+        return quantity * unit_price
+    return total_price if is_number(total_price) else 0
+
+
+def range_bound(value):
+    """
+    Return a bed range boundary as stored in an index (float or inf) as an int, or None for inf.
+    """
+    if math.isinf(value):
+        return None
+    return int(value) if float(value).is_integer() else value
+
+
+@dataclass(frozen=True, slots=True)
+class EquipmentLine:
+    """One equipment requirement for a bed range."""
+    name: str
+    specification: str
+    quantity: Union[int, str]
+    unit_price: Optional[int] = None
+    total_price: Optional[int] = None
+
+    @property
+    def cost(self):
+        return line_cost(self.quantity, self.unit_price, self.total_price)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'specification': self.specification,
+            'quantity': self.quantity,
+            'unit_price': _or_not_specified(self.unit_price),
+            'total_price': _or_not_specified(self.total_price)
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Budget:
+    """Official tentative budget range for a bed range."""
+    min: Optional[int] = None
+    max: Optional[int] = None
+
+    def to_dict(self):
+        return {'min': _or_not_specified(self.min), 'max': _or_not_specified(self.max)}
+
+
+@dataclass(frozen=True, slots=True)
+class BedRange:
+    """
+    CSSD requirements for one bed range of the planning workbook.
+    max_beds is None for an open-ended range such as "201+".
+    """
+    min_beds: int
+    max_beds: Optional[int]
+    original_range: str
+    area: Union[int, float, str, None] = None
+    autoclave_model: Optional[str] = None
+    autoclave_quantity: Union[int, float, None] = None
+    equipment: tuple = ()
+    budget: Budget = Budget()
+
+    def to_dict(self):
+        """
+        Serialize to the /calculate response shape (without bed_count).
+        """
+        return {
+            'bed_range': self.original_range,
+            'cssd_area': _or_not_specified(self.area),
+            'autoclave_model': _or_not_specified(self.autoclave_model),
+            'autoclave_quantity': _or_not_specified(self.autoclave_quantity),
+            'equipment': [item.to_dict() for item in self.equipment],
+            'official_budget': self.budget.to_dict()
+        }
+
+
+def _none_if_not_specified(value):
+    return None if value == NOT_SPECIFIED else value
+
+
+def bed_range_from_dict(payload, min_beds, max_beds):
+    """
+    Rebuild a BedRange from its serialized payload (the inverse of BedRange.to_dict).
+    """
+    return BedRange(
+        min_beds=min_beds,
+        max_beds=max_beds,
+        original_range=payload['bed_range'],
+        area=_none_if_not_specified(payload['cssd_area']),
+        autoclave_model=_none_if_not_specified(payload['autoclave_model']),
+        autoclave_quantity=_none_if_not_specified(payload['autoclave_quantity']),
+        equipment=tuple(
+            EquipmentLine(
+                name=intern_text(item['name']),
+                specification=intern_text(item['specification']),
+                quantity=item['quantity'],
+                unit_price=_none_if_not_specified(item['unit_price']),
+                total_price=_none_if_not_specified(item['total_price'])
+            )
+            for item in payload['equipment']
+        ),
+        budget=Budget(
+            min=_none_if_not_specified(payload['official_budget']['min']),
+            max=_none_if_not_specified(payload['official_budget']['max'])
+        )
+    )
@@ -0,0 +1,223 @@
+"""
+Read-only memory-mapped CSSD data shared by all gunicorn workers.
+
+The compiled bed-range index is written once into a flat binary file (by the
+gunicorn master under --preload, or ahead of time with
+"python -m utils.shared_data") and every worker maps it with mmap. Bucket
+lookups bisect directly over the mapped boundary arrays and responses are
+sliced straight out of the mapped JSON blob, so the pages are shared by the
+OS page cache and memory does not grow with the number of workers.
+
+File layout (little-endian):
+
+    magic         8 bytes   b"CSSDMAP1"
+    header_len    uint32    length of the JSON header
+    header        JSON      {"version", "modified", "count", "schema_issues"}
+    (padding to an 8-byte boundary)
+    starts        count x float64   effective segment starts
+    stops         count x float64   segment stops (inf for open-ended)
+    min_beds      count x float64   workbook range minimums
+    max_beds      count x float64   workbook range maximums (inf if open-ended)
+    offsets       (count + 1) x uint64   payload offsets into the blob
+    blob          payload JSON, each without its opening brace
+"""
+import argparse
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_right
+from pathlib import Path
+
+from utils.excel_parser import DEFAULT_EXCEL_FILE
+from utils.models import bed_range_from_dict, range_bound
+from utils.snapshot import data_version, load_cached_cssd_data, workbook_fingerprint
+
+MAGIC = b'CSSDMAP1'
+
+DEFAULT_SHARED_DATA_FILE = Path(__file__).parent.parent / "instance" / "cssd_data.bin"
+
+
+def shared_data_file():
+    """
+    Return the mapped data file configured by CSSD_SHARED_DATA_FILE, or None if
+    shared mode is disabled. Relative paths are resolved from the project root.
+    """
+    configured = os.environ.get("CSSD_SHARED_DATA_FILE")
+    if not configured:
+        return None
+    path = Path(configured)
+    return path if path.is_absolute() else Path(__file__).parent.parent / path
+
+
+class MappedIndex:
+    """
+    BedRangeIndex-compatible lookup reading bucket records from a mapped file.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{path} is not a CSSD shared data file")
+        (header_len,) = struct.unpack_from('<I', self._mm, 8)
+        self.header = json.loads(self._mm[12:12 + header_len])
+        count = self.header['count']
+
+        view = memoryview(self._mm)
+        position = _align(12 + header_len)
+        arrays = []
+        for _ in range(4):
+            arrays.append(view[position:position + 8 * count].cast('d'))
+            position += 8 * count
+        self.starts, self.stops, self._min_beds, self._max_beds = arrays
+        self._offsets = view[position:position + 8 * (count + 1)].cast('Q')
+        self._blob = position + 8 * (count + 1)
+        self._ranges = None
+
+    def __len__(self):
+        return self.header['count']
+
+    def find(self, bed_count):
+        """
+        Return the position of the segment containing bed_count, or None.
+        """
+        pos = bisect_right(self.starts, bed_count) - 1
+        if pos >= 0 and bed_count < self.stops[pos]:
+            return pos
+        return None
+
+    def _payload_tail(self, pos):
+        return self._mm[self._blob + self._offsets[pos]:self._blob + self._offsets[pos + 1]]
+
+    def payload(self, pos):
+        return b'{' + self._payload_tail(pos)
+
+    def response_json(self, pos, bed_count):
+        return b'{"bed_count":%d,' % bed_count + self._payload_tail(pos)
+
+    def requirements(self, bed_count):
+        pos = self.find(bed_count)
+        if pos is None:
+            return None
+        return {'bed_count': bed_count, **json.loads(self.payload(pos))}
+
+    def lookup(self, bed_count):
+        pos = self.find(bed_count)
+        return self.ranges[pos] if pos is not None else None
+
+    @property
+    def ranges(self):
+        """
+        BedRange models decoded from the mapped payloads on first use.
+        Only needed by paths that work on models (costing, detail logging).
+        """
+        if self._ranges is None:
+            self._ranges = tuple(
+                bed_range_from_dict(json.loads(self.payload(pos)), range_bound(self._min_beds[pos]),
+                                    range_bound(self._max_beds[pos]))
+                for pos in range(len(self))
+            )
+        return self._ranges
+
+
+def write_shared_data(data, path):
+    """
+    Atomically write the compiled index of data to a mapped data file.
+    Existing mappings of a replaced file stay valid until they are closed.
+    """
+    index = data['index']
+    count = len(index)
+    header = json.dumps({
+        'version': data.get('version'),
+        'modified': data.get('modified'),
+        'count': count,
+        'schema_issues': list(data.get('schema_issues', ()))
+    }).encode()
+
+    offsets = [0]
+    for tail in index.payload_json:
+        offsets.append(offsets[-1] + len(tail))
+
+    parts = [MAGIC, struct.pack('<I', len(header)), header]
+    parts.append(b'\0' * (_align(12 + len(header)) - 12 - len(header)))
+    parts.append(struct.pack(f'<{count}d', *index.starts))
+    parts.append(struct.pack(f'<{count}d', *index.stops))
+    parts.append(struct.pack(f'<{count}d', *(r.min_beds for r in index.ranges)))
+    parts.append(struct.pack(f'<{count}d', *(math.inf if r.max_beds is None else r.max_beds
+                                            for r in index.ranges)))
+    parts.append(struct.pack(f'<{count + 1}Q', *offsets))
+    parts.extend(index.payload_json)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b''.join(parts))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    logging.info(f"Wrote shared CSSD data {path} (version {data.get('version')})")
+
+
+def load_shared_cssd_data(excel_file=None, snapshot_file=None, shared_file=None, force=False):
+    """
+    Map the shared data file if it matches the workbook, otherwise rebuild it
+    from the snapshot cache or the workbook first.
+    """
+    excel_file = Path(excel_file or DEFAULT_EXCEL_FILE)
+    shared_file = Path(shared_file or DEFAULT_SHARED_DATA_FILE)
+
+    if not force:
+        try:
+            index = MappedIndex(shared_file)
+            if index.header['version'] == data_version(workbook_fingerprint(excel_file)):
+                logging.info(f"Mapped shared CSSD data (version {index.header['version']})")
+                return _mapped_data(index)
+        except (OSError, ValueError) as e:
+            logging.info(f"Shared CSSD data unavailable, rebuilding: {e}")
+
+    data = load_cached_cssd_data(excel_file, snapshot_file, force=force)
+    write_shared_data(data, shared_file)
+    return _mapped_data(MappedIndex(shared_file))
+
+
+def _mapped_data(index):
+    return {
+        'index': index,
+        'version': index.header['version'],
+        'modified': index.header['modified'],
+        'schema_issues': tuple(index.header.get('schema_issues', ())),
+        'shared': True
+    }
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prebuild the memory-mapped CSSD data file.")
+    parser.add_argument('--workbook', default=DEFAULT_EXCEL_FILE, help="Path to the planning workbook")
+    parser.add_argument('--output', default=shared_data_file() or DEFAULT_SHARED_DATA_FILE,
+                        help="Path of the mapped data file to write")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the file is current")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        data = load_shared_cssd_data(args.workbook, shared_file=args.output, force=args.force)
+    except Exception as e:
+        parser.exit(1, f"Workbook could not be parsed; no shared data file written\n{e}\n")
+    print(f"Shared CSSD data version {data['version']} ready at {args.output}")
+
+
+if __name__ == '__main__':
+    main()
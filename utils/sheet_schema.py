@@ -0,0 +1,391 @@
+"""
+Declarative layout of a CSSD planning sheet and its compiled row/column map.
+
+A planning sheet starts with a header row ("Hospital Bed Size" in column A,
+one "min-max" bed range per column from column C) followed by labelled
+blocks. Column A labels a block and column B names each of its rows:
+
+    Cyliendrical Autoclave   Size   16x24 ...
+                             Qty    1     ...
+                             Rate   480000 ...
+                             Amount 480000 ...
+
+Labels are matched exactly after collapsing whitespace and case, against the
+aliases declared in PLANNING_SHEET (the workbook's typos are listed there
+explicitly). Compiling a sheet resolves every field to an exact row index
+and reports every problem with its cell reference; structural problems raise
+SheetSchemaError instead of producing partial data. Compiled maps are cached
+as JSON by workbook hash and sheet, so later parses of the same workbook read
+the mapped rows directly without detection; only the most recently used maps
+are kept.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# Bump whenever PLANNING_SHEET or the compiled map format changes
+SCHEMA_VERSION = 1
+
+DEFAULT_SHEET_MAP_DIR = Path(__file__).parent.parent / "instance" / "sheet_maps"
+
+# Most recently used sheet maps kept; older ones belong to replaced workbooks
+KEEP_SHEET_MAPS = 64
+
+# First column holding a bed range in the header row (column C)
+FIRST_RANGE_COLUMN = 2
+
+
+@dataclass(frozen=True, slots=True)
+class Block:
+    """
+    A labelled group of rows. parameters maps each field to its column B
+    aliases; a field of None marks rows that are recognised but not used.
+    A block without parameters reads its values from the label row itself.
+    """
+    kind: str
+    name: str
+    labels: tuple
+    parameters: tuple = ()
+    required_fields: tuple = ()
+    required: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class SheetSchema:
+    header_labels: tuple
+    blocks: tuple
+
+    def block_for(self, label):
+        for block in self.blocks:
+            if label in block.labels:
+                return block
+        return None
+
+
+EQUIPMENT_ROWS = (
+    ('specification', ('size', 'size in mm')),
+    ('quantity', ('qty',)),
+    ('unit_price', ('rate',)),
+    (None, ('amount',))
+)
+
+
+def _equipment(name, *labels):
+    return Block('equipment', name, labels, EQUIPMENT_ROWS, ('specification', 'quantity'))
+
+
+PLANNING_SHEET = SheetSchema(
+    header_labels=('hospital bed size',),
+    blocks=(
+        Block('area', 'CSSD area', ('cssd area required in sq ft', 'cssd area required in sq ft @ 7.5 per bed'),
+              required=True),
+        _equipment("Cylindrical Autoclave", 'cyliendrical autoclave', 'cylindrical autoclave'),
+        _equipment("Rectangular Autoclave", 'reactangular autoclave', 'rectangular autoclave'),
+        _equipment("Vertical Autoclave", 'vertical autoclave'),
+        _equipment("Flash Autoclave", 'flash autoclave'),
+        _equipment("ETO Sterilizer", 'eto', 'eto size', 'eto sterilizer'),
+        _equipment("Heat Sealing Machine", 'heat sealing machine'),
+        _equipment("ETO Packing Table", 'eto packing table'),
+        _equipment("Washer Disinfector", 'washer disinfector', 'washer disinfector size'),
+        _equipment("Ultrasonic Cleaner", 'ultrasonic cleaner', 'ultrasonic cleaner size'),
+        _equipment("Hot Air Oven", 'hot air ovan', 'hot air oven'),
+        _equipment("Pass Box", 'pass box', 'pass box qty size'),
+        _equipment("Storage Rack", 'storage rack', 'storage rack qty size'),
+        _equipment("Open Trolley", 'open trolly', 'open trolley'),
+        _equipment("Closed Trolley", 'close trolly', 'close trolly size', 'closed trolley'),
+        _equipment("Work Table", 'work table', 'work table size'),
+        Block('budget', 'Expected Tentative Budget', ('expected tentative budget',),
+              (('min', ('minimum',)), ('max', ('maximum',))), ('min', 'max'))
+    )
+)
+
+
+@dataclass(frozen=True, slots=True)
+class SchemaIssue:
+    """One problem found in a sheet, located by its cell reference."""
+    level: str
+    cell: str
+    message: str
+
+    def __str__(self):
+        return f"{self.cell}: {self.message}"
+
+
+class SheetSchemaError(ValueError):
+    """
+    Raised when a sheet does not match the planning schema; issues lists every problem found.
+    """
+
+    def __init__(self, sheet, issues, header_found=True):
+        self.sheet = sheet
+        self.issues = list(issues)
+        self.header_found = header_found
+        errors = [str(issue) for issue in self.issues if issue.level == 'error']
+        super().__init__(f"Sheet '{sheet}' does not match the CSSD planning schema: " + "; ".join(errors))
+
+    def __reduce__(self):
+        # Raised in ingest pool workers, so it must survive pickling
+        return type(self), (self.sheet, self.issues, self.header_found)
+
+
+@dataclass(frozen=True, slots=True)
+class SheetMap:
+    """
+    Exact positions of everything read from a sheet (0-based row and column indices).
+    columns holds (column, header, min_beds, max_beds) per bed range and
+    blocks maps each block name to {field: row}, in sheet order.
+    """
+    sheet: str
+    header_row: int
+    columns: tuple
+    blocks: dict
+    issues: tuple = ()
+
+    def rows(self):
+        """The row indices whose values are read."""
+        rows = {self.header_row}
+        for fields in self.blocks.values():
+            rows.update(fields.values())
+        return rows
+
+    def row(self, block, field):
+        fields = self.blocks.get(block)
+        return fields.get(field) if fields else None
+
+    def equipment(self, schema=None):
+        """(name, fields) of the mapped equipment blocks in sheet order."""
+        kinds = {block.name: block.kind for block in (schema or PLANNING_SHEET).blocks}
+        return [(name, fields) for name, fields in self.blocks.items() if kinds.get(name) == 'equipment']
+
+    def to_dict(self):
+        return {
+            'schema': SCHEMA_VERSION,
+            'sheet': self.sheet,
+            'header_row': self.header_row,
+            'columns': [list(column) for column in self.columns],
+            'blocks': self.blocks,
+            'issues': [[issue.level, issue.cell, issue.message] for issue in self.issues]
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        return cls(
+            sheet=payload['sheet'],
+            header_row=payload['header_row'],
+            columns=tuple(tuple(column) for column in payload['columns']),
+            blocks=payload['blocks'],
+            issues=tuple(SchemaIssue(*issue) for issue in payload['issues'])
+        )
+
+
+def normalize_label(value):
+    """
+    Collapse whitespace and case of a label cell; None for empty or non-text cells.
+    """
+    if not isinstance(value, str):
+        return None
+    return ' '.join(value.split()).lower() or None
+
+
+def cell_ref(sheet, row, col):
+    """
+    Return an Excel-style reference such as Sheet1!C4 for 0-based row and column indices.
+    """
+    letters = ''
+    col += 1
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return f"{sheet}!{letters}{row + 1}"
+
+
+def parse_bed_range_header(value):
+    """
+    Return (min_beds, max_beds) for a "min-max" or open-ended "min+" header, else None.
+    """
+    text = str(value).strip()
+    match = re.fullmatch(r'(\d+)\s*-\s*(\d+)', text)
+    if match:
+        return int(match[1]), int(match[2])
+    match = re.fullmatch(r'(\d+)\s*\+', text)
+    if match:
+        return int(match[1]), None
+    return None
+
+
+def compile_sheet_map(rows, sheet, schema=PLANNING_SHEET):
+    """
+    Detect the layout of streamed rows in a single pass.
+    Returns (SheetMap, {row index: row}) with only the mapped rows retained,
+    or raises SheetSchemaError listing every structural problem.
+    """
+    issues = []
+    kept = {}
+    header_row = None
+    columns = []
+    blocks = {}
+    current = None  # (block, fields) of the block whose parameter rows follow
+
+    def issue(level, row, col, message):
+        issues.append(SchemaIssue(level, cell_ref(sheet, row, col), message))
+
+    for idx, row in enumerate(rows):
+        label = normalize_label(row[0]) if row else None
+        parameter = normalize_label(row[1]) if row and len(row) > 1 else None
+
+        if header_row is None:
+            if label in schema.header_labels:
+                header_row = idx
+                kept[idx] = row
+                columns = _header_columns(row, idx, issue)
+            continue
+
+        if label is not None:
+            current = None
+            block = schema.block_for(label)
+            if block is None:
+                issue('warning', idx, 0, f"Unrecognised row label {row[0]!r} ignored")
+                continue
+            if block.name in blocks:
+                first = _first_row(blocks[block.name])
+                issue('warning', idx, 0, f"'{block.name}' already defined at row {first + 1}; ignored")
+                continue
+            blocks[block.name] = fields = {}
+            if not block.parameters:
+                fields[block.kind] = idx
+                kept[idx] = row
+                continue
+            current = (block, fields)
+
+        if current is None or parameter is None:
+            continue
+        block, fields = current
+        field = _parameter_field(block, parameter)
+        if field is False:
+            issue('warning', idx, 1, f"Unrecognised parameter {row[1]!r} of '{block.name}' ignored")
+        elif field is not None:
+            if field in fields:
+                issue('warning', idx, 1, f"Duplicate {row[1]!r} row of '{block.name}' ignored")
+            else:
+                fields[field] = idx
+                kept[idx] = row
+
+    if header_row is None:
+        issues.append(SchemaIssue('error', f"{sheet}!A:A",
+                                  f"No {schema.header_labels[0]!r} header row found in column A"))
+        raise SheetSchemaError(sheet, issues, header_found=False)
+    if not columns:
+        issue('error', header_row, FIRST_RANGE_COLUMN, "Header row has no bed range columns")
+
+    for block in schema.blocks:
+        fields = blocks.get(block.name)
+        if fields is None:
+            if block.required:
+                issues.append(SchemaIssue('error', f"{sheet}!A:A",
+                                          f"No {block.labels[0]!r} row found in column A"))
+            continue
+        missing = [field for field in block.required_fields if field not in fields]
+        if missing:
+            aliases = dict(block.parameters)
+            names = ', '.join(repr(aliases[field][0].capitalize()) for field in missing)
+            first = _first_row(fields) if fields else None
+            location = cell_ref(sheet, first, 1) if first is not None else f"{sheet}!B:B"
+            issues.append(SchemaIssue('error', location, f"'{block.name}' has no {names} row in column B"))
+
+    if any(issue.level == 'error' for issue in issues):
+        raise SheetSchemaError(sheet, issues)
+    sheet_map = SheetMap(sheet, header_row, tuple(columns), blocks, tuple(issues))
+    return sheet_map, kept
+
+
+def _header_columns(row, idx, issue):
+    columns = []
+    for col in range(FIRST_RANGE_COLUMN, len(row)):
+        value = row[col]
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        bounds = parse_bed_range_header(value)
+        if bounds is None:
+            issue('error', idx, col, f"Bed range header {value!r} is not of the form 'min-max'")
+            continue
+        columns.append((col, str(value).strip(), *bounds))
+    return columns
+
+
+def _parameter_field(block, parameter):
+    # The field of a parameter row, None for recognised but unused rows, False if unknown
+    for field, aliases in block.parameters:
+        if parameter in aliases:
+            return field
+    return False
+
+
+def _first_row(fields):
+    return min(fields.values()) if fields else 0
+
+
+def sheet_map_dir():
+    return Path(os.environ.get("CSSD_SHEET_MAP_DIR", DEFAULT_SHEET_MAP_DIR))
+
+
+def sheet_map_file(workbook_sha256, sheet, directory=None):
+    name = re.sub(r'[^a-z0-9]+', '-', sheet.lower()).strip('-') or 'sheet'
+    return Path(directory or sheet_map_dir()) / f"{workbook_sha256[:16]}-{name}-v{SCHEMA_VERSION}.json"
+
+
+def read_sheet_map(workbook_sha256, sheet, directory=None) -> Optional[SheetMap]:
+    """
+    Return the cached map of a sheet of the workbook with this hash, or None.
+    """
+    path = sheet_map_file(workbook_sha256, sheet, directory)
+    try:
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('schema') != SCHEMA_VERSION or payload.get('sheet') != sheet:
+            return None
+        sheet_map = SheetMap.from_dict(payload)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable sheet map {path}: {e}")
+        return None
+    try:
+        os.utime(path)  # Keeps maps in use among the most recent ones
+    except OSError:
+        pass
+    return sheet_map
+
+
+def write_sheet_map(sheet_map, workbook_sha256, directory=None):
+    """
+    Atomically cache a compiled sheet map under the workbook hash and prune
+    all but the KEEP_SHEET_MAPS most recently used maps.
+    """
+    path = sheet_map_file(workbook_sha256, sheet_map.sheet, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(sheet_map.to_dict(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    _prune(path.parent)
+
+
+def _prune(directory):
+    try:
+        maps = sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for path in maps[KEEP_SHEET_MAPS:]:
+        try:
+            path.unlink()
+        except OSError as e:
+            logging.debug(f"Could not prune sheet map {path}: {e}")
@@ -0,0 +1,214 @@
+"""
+Capacity-based CSSD sizing for arbitrary bed counts.
+
+The planning workbook only answers for the bed counts its ranges cover. The
+sizing engine anchors each bed range at the capacity it was designed for and
+interpolates CSSD area, equipment quantities and budgets between those anchor
+points, scaling them in proportion to beds past the last range. Autoclave
+capacity is derived from sterile-processing throughput instead of the
+workbook's model-specific counts. Everything is evaluated over NumPy arrays,
+so a full bed-count curve costs about as much as a single estimate.
+"""
+import math
+from dataclasses import asdict, dataclass, fields
+
+import numpy as np
+
+from utils.batch import parse_bed_count
+from utils.costing import cost_matrix_for
+from utils.models import number
+
+# Largest number of bed counts evaluated for one curve
+MAX_CURVE_POINTS = 10000
+
+# Largest bed count sized; far past the workbook ranges extrapolation is
+# meaningless and the results would overflow the integer columns
+MAX_BED_COUNT = 100000
+
+
+@dataclass(frozen=True, slots=True)
+class SizingParameters:
+    """Sterile-processing throughput assumptions used to size autoclave capacity."""
+    trays_per_bed_per_day: float = 0.5
+    trays_per_cycle: float = 24
+    cycle_minutes: float = 75
+    shifts: float = 3
+    shift_hours: float = 8
+    utilization: float = 0.85
+
+    @classmethod
+    def from_mapping(cls, values):
+        """
+        Build parameters from request values, keeping defaults for missing ones.
+        Raises ValueError for invalid values.
+        """
+        overrides = {}
+        for field in fields(cls):
+            raw = values.get(field.name)
+            if raw is None or raw == '':
+                continue
+            try:
+                value = float(raw)
+            except (TypeError, ValueError):
+                value = math.nan
+            if not math.isfinite(value) or value <= 0:
+                raise ValueError(f"{field.name} must be a positive number")
+            overrides[field.name] = value
+
+        parameters = cls(**overrides)
+        if parameters.utilization > 1:
+            raise ValueError("utilization must not exceed 1")
+        if parameters.shifts * parameters.shift_hours > 24:
+            raise ValueError("shifts x shift_hours must not exceed 24 hours")
+        return parameters
+
+    @property
+    def cycles_per_autoclave(self):
+        """Sterilization cycles one autoclave can run per day."""
+        return self.shifts * self.shift_hours * 60 / self.cycle_minutes * self.utilization
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class SizingEngine:
+    """
+    Vectorized interpolation of workbook requirements plus throughput-based autoclave sizing.
+
+    Each bed range is anchored at its upper bound (open-ended ranges at their
+    lower bound). Below the first anchor the smallest range applies; between
+    anchors values are interpolated linearly and quantities rounded up; above
+    the last anchor values grow in proportion to the bed count.
+    """
+
+    def __init__(self, index, matrix):
+        self.index = index
+        self.equipment_names = matrix.equipment_names
+
+        anchors = np.array([bed_range.min_beds if bed_range.max_beds is None else bed_range.max_beds
+                            for bed_range in index.ranges], dtype=float)
+        order = np.argsort(anchors, kind='stable')
+        self.anchors = anchors[order]
+        self.area = np.array([number(bed_range.area, np.nan) for bed_range in index.ranges], dtype=float)[order]
+        self.quantity = matrix.quantity[order].astype(float)
+        self.budget_min = matrix.official_min[order]
+        self.budget_max = matrix.official_max[order]
+
+    def curve(self, bed_counts, parameters=SizingParameters()):
+        """
+        Evaluate the requirements for an array of positive bed counts.
+        Returns a dictionary of arrays aligned with bed_counts.
+        """
+        beds = np.asarray(bed_counts, dtype=float)
+        trays = beds * parameters.trays_per_bed_per_day
+        cycles = np.ceil(trays / parameters.trays_per_cycle)
+        return {
+            'bed_counts': beds.astype(np.int64),
+            'cssd_area': np.rint(self._interpolate(beds, self.area)),
+            'trays_per_day': np.ceil(trays),
+            'sterilization_cycles': cycles,
+            'autoclaves': np.maximum(1, np.ceil(cycles / parameters.cycles_per_autoclave)),
+            'equipment': np.column_stack([
+                np.ceil(self._interpolate(beds, self.quantity[:, col]) - 1e-9)
+                for col in range(len(self.equipment_names))
+            ]) if self.equipment_names else np.zeros((beds.size, 0)),
+            'budget_min': np.rint(self._interpolate(beds, self.budget_min)),
+            'budget_max': np.rint(self._interpolate(beds, self.budget_max))
+        }
+
+    def curve_json(self, bed_counts, parameters=SizingParameters()):
+        """
+        Return a curve as JSON-serializable columns for charting.
+        """
+        curve = self.curve(bed_counts, parameters)
+        return {
+            'bed_counts': curve['bed_counts'].tolist(),
+            'cssd_area': _column(curve['cssd_area']),
+            'trays_per_day': _column(curve['trays_per_day']),
+            'sterilization_cycles': _column(curve['sterilization_cycles']),
+            'autoclaves': _column(curve['autoclaves']),
+            'equipment': {name: _column(curve['equipment'][:, col])
+                          for col, name in enumerate(self.equipment_names)},
+            'official_budget': {'min': _column(curve['budget_min']), 'max': _column(curve['budget_max'])},
+            'parameters': parameters.to_dict()
+        }
+
+    def estimate(self, bed_count, parameters=SizingParameters()):
+        """
+        Return the sized requirements for a single bed count.
+        """
+        curve = self.curve([bed_count], parameters)
+        bucket = self.index.find(bed_count)
+        return {
+            'bed_count': bed_count,
+            'bed_range': self.index.ranges[bucket].original_range if bucket is not None else None,
+            'extrapolated': bool(self.anchors.size == 0 or bed_count > self.anchors[-1]),
+            'cssd_area': _column(curve['cssd_area'])[0],
+            'trays_per_day': _column(curve['trays_per_day'])[0],
+            'sterilization_cycles': _column(curve['sterilization_cycles'])[0],
+            'autoclaves': _column(curve['autoclaves'])[0],
+            'equipment': [{'name': name, 'quantity': quantity}
+                          for name, quantity in zip(self.equipment_names, _column(curve['equipment'][0]))
+                          if quantity],
+            'official_budget': {'min': _column(curve['budget_min'])[0], 'max': _column(curve['budget_max'])[0]},
+            'parameters': parameters.to_dict()
+        }
+
+    def _interpolate(self, beds, values):
+        known = ~np.isnan(values)
+        if not known.any():
+            return np.full(beds.shape, np.nan)
+        anchors, values = self.anchors[known], values[known]
+        result = np.interp(beds, anchors, values)
+        above = beds > anchors[-1]
+        result[above] = values[-1] * beds[above] / anchors[-1]
+        return result
+
+
+def sizing_engine_for(data):
+    """
+    Return the SizingEngine for a data set, building it on first use.
+    """
+    engine = data.get('sizing_engine')
+    if engine is None:
+        engine = data['sizing_engine'] = SizingEngine(data['index'], cost_matrix_for(data))
+    return engine
+
+
+def sizing_bed_count(value):
+    """
+    Convert a bed count from a request to a positive int of at most MAX_BED_COUNT.
+    Raises ValueError otherwise.
+    """
+    bed_count = parse_bed_count(value)
+    if bed_count > MAX_BED_COUNT:
+        raise ValueError(f"Sizing is limited to {MAX_BED_COUNT} beds")
+    return bed_count
+
+
+def curve_bed_counts(start=1, stop=5000, step=1):
+    """
+    Return the bed counts start..stop (inclusive) in steps of step.
+    Raises ValueError for invalid or oversized ranges.
+    """
+    try:
+        start, stop, step = int(start), int(stop), int(step)
+    except (TypeError, ValueError):
+        raise ValueError("Curve start, stop and step must be whole numbers")
+    if start <= 0 or stop < start or step <= 0:
+        raise ValueError("Curve range must satisfy 0 < start <= stop and step > 0")
+    if stop > MAX_BED_COUNT:
+        raise ValueError(f"Sizing is limited to {MAX_BED_COUNT} beds")
+    # Checked before the array is built, so oversized requests allocate nothing
+    if (stop - start) // step + 1 > MAX_CURVE_POINTS:
+        raise ValueError(f"Curves are limited to {MAX_CURVE_POINTS} points; increase step")
+    return np.arange(start, stop + 1, step)
+
+
+def _column(values):
+    """
+    Convert a float array to a list of ints, with None for NaN.
+    """
+    if not np.isnan(values).any():
+        return values.astype(np.int64).tolist()
+    return [None if value != value else int(value) for value in values.tolist()]
@@ -0,0 +1,137 @@
+"""
+Binary snapshot cache of the parsed CSSD planning data.
+
+Parsing the workbook costs seconds per worker, so the compiled data is pickled
+next to the app after the first parse and reloaded in milliseconds afterwards.
+A snapshot is only used when its format version and the workbook fingerprint
+(size, mtime and SHA-256) match; otherwise the workbook is parsed again.
+
+Prebuild at deploy time with:
+
+    python -m utils.snapshot
+"""
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+from utils.excel_parser import DEFAULT_EXCEL_FILE, load_cssd_data
+
+# Bump whenever the pickled data structure or the parsed values change
+SNAPSHOT_FORMAT = 4
+
+DEFAULT_SNAPSHOT_FILE = Path(
+    os.environ.get("CSSD_SNAPSHOT_FILE",
+                   Path(__file__).parent.parent / "instance" / "cssd_snapshot.pickle")
+)
+
+
+def workbook_fingerprint(excel_file, previous=None):
+    """
+    Return a dictionary identifying the workbook contents.
+    The SHA-256 is reused from previous when size and mtime are unchanged.
+    """
+    stat = os.stat(excel_file)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        fingerprint['sha256'] = previous['sha256']
+    else:
+        with open(excel_file, 'rb') as f:
+            fingerprint['sha256'] = hashlib.sha256(f.read()).hexdigest()
+    return fingerprint
+
+
+def data_version(fingerprint):
+    """
+    Return the short data version string derived from a workbook fingerprint.
+    It also changes with SNAPSHOT_FORMAT, so data parsed differently from the
+    same workbook never shares a version (or an ETag) with the old data.
+    """
+    return hashlib.sha256(f"{SNAPSHOT_FORMAT}:{fingerprint['sha256']}".encode()).hexdigest()[:12]
+
+
+def read_snapshot(snapshot_file=None):
+    """
+    Read a snapshot file. Returns (fingerprint, data) or None if missing or unreadable.
+    """
+    snapshot_file = Path(snapshot_file or DEFAULT_SNAPSHOT_FILE)
+    try:
+        with open(snapshot_file, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable CSSD snapshot {snapshot_file}: {e}")
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get('format') != SNAPSHOT_FORMAT:
+        logging.info(f"Ignoring CSSD snapshot {snapshot_file} with outdated format")
+        return None
+    return snapshot['fingerprint'], snapshot['data']
+
+
+def write_snapshot(data, fingerprint, snapshot_file=None):
+    """
+    Atomically write data and its workbook fingerprint to the snapshot file.
+    """
+    snapshot_file = Path(snapshot_file or DEFAULT_SNAPSHOT_FILE)
+    snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+    snapshot = {'format': SNAPSHOT_FORMAT, 'fingerprint': fingerprint, 'data': data}
+
+    # Write to a temporary file first so concurrent workers never read a partial snapshot
+    fd, tmp_path = tempfile.mkstemp(dir=snapshot_file.parent, prefix=snapshot_file.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_file)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    logging.info(f"Wrote CSSD snapshot {snapshot_file} (version {data_version(fingerprint)})")
+
+
+def load_cached_cssd_data(excel_file=None, snapshot_file=None, force=False):
+    """
+    Load CSSD data from the snapshot if it matches the workbook, otherwise parse
+    the workbook and refresh the snapshot. Raises OSError if the workbook cannot
+    be read and SheetSchemaError if it does not match the planning schema.
+    """
+    excel_file = Path(excel_file or DEFAULT_EXCEL_FILE)
+
+    cached = None if force else read_snapshot(snapshot_file)
+    fingerprint = workbook_fingerprint(excel_file, cached[0] if cached else None)
+
+    if cached and cached[0]['sha256'] == fingerprint['sha256']:
+        logging.info(f"Loaded CSSD data from snapshot (version {data_version(fingerprint)})")
+        return cached[1]
+
+    data = load_cssd_data(excel_file)
+    data['version'] = data_version(fingerprint)
+    data['modified'] = fingerprint['mtime_ns'] / 1e9
+    try:
+        write_snapshot(data, fingerprint, snapshot_file)
+    except OSError as e:
+        logging.warning(f"Could not write CSSD snapshot: {e}")
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prebuild the CSSD planning data snapshot.")
+    parser.add_argument('--workbook', default=DEFAULT_EXCEL_FILE, help="Path to the planning workbook")
+    parser.add_argument('--output', default=DEFAULT_SNAPSHOT_FILE, help="Path of the snapshot file to write")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the snapshot is current")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        data = load_cached_cssd_data(args.workbook, args.output, force=args.force)
+    except Exception as e:
+        parser.exit(1, f"Workbook could not be parsed; no snapshot written\n{e}\n")
+    print(f"CSSD snapshot version {data['version']} ready at {args.output}")
+
+
+if __name__ == '__main__':
+    main()
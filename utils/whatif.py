@@ -0,0 +1,313 @@
+"""
+What-if comparisons of CSSD requirements against a base bed count.
+
+A scenario changes the bed count (bed_delta or an absolute bed_count), the
+main autoclave type, or equipment prices and quantities. Equipment lines of
+each bucket are compiled once; a scenario copies the base lines, recomputes
+only the lines it touches and adjusts the equipment total by their
+difference. Results are memoized per data set in a bounded LRU cache keyed
+by bucket and scenario, so repeated sweeps are served without recomputing.
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.models import is_number, line_cost
+
+# Largest number of scenarios compared in one request
+MAX_SCENARIOS = 100
+
+DEFAULT_CACHE_SIZE = int(os.environ.get("CSSD_WHATIF_CACHE_SIZE", "1024"))
+
+AUTOCLAVE_TYPES = {
+    'cylindrical': 'Cylindrical Autoclave',
+    'rectangular': 'Rectangular Autoclave'
+}
+
+
+class LRUCache:
+    """
+    Thread-safe mapping that evicts the least recently used entry beyond maxsize.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    """A set of changes applied to a base bed count. Hashable, so it can key the cache."""
+    name: str = ''
+    bed_delta: int = 0
+    bed_count: Optional[int] = None
+    autoclave: Optional[str] = None
+    prices: tuple = ()
+    quantities: tuple = ()
+
+    @classmethod
+    def from_dict(cls, payload, equipment_names):
+        """
+        Build a scenario from a request object, raising ValueError if it is invalid.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("Each scenario must be an object")
+
+        bed_delta = payload.get('bed_delta', 0)
+        if not _is_int(bed_delta):
+            raise ValueError("bed_delta must be a whole number")
+        bed_count = payload.get('bed_count')
+        if bed_count is not None and (not _is_int(bed_count) or bed_count <= 0):
+            raise ValueError("bed_count must be a positive whole number")
+
+        autoclave = payload.get('autoclave')
+        if autoclave is not None:
+            autoclave = str(autoclave).lower()
+            if autoclave not in AUTOCLAVE_TYPES:
+                raise ValueError(f"autoclave must be one of: {', '.join(AUTOCLAVE_TYPES)}")
+
+        return cls(
+            name=str(payload.get('name', '')),
+            bed_delta=int(bed_delta),
+            bed_count=bed_count,
+            autoclave=autoclave,
+            prices=_overrides(payload.get('prices'), 'prices', equipment_names, _is_amount),
+            quantities=_overrides(payload.get('quantities'), 'quantities', equipment_names,
+                                  lambda value: _is_int(value) and value >= 0)
+        )
+
+    def key(self):
+        """The fields that determine the result (the name does not)."""
+        return self.autoclave, self.prices, self.quantities
+
+
+class WhatIfEngine:
+    """
+    Compiled equipment lines per bucket plus the memo of scenario results.
+    """
+
+    def __init__(self, index, cache_size=DEFAULT_CACHE_SIZE):
+        self.index = index
+        self.cache = LRUCache(cache_size)
+        self._lines = {}
+
+        # Reference spec and price of every equipment item, used when a
+        # scenario adds an item its bucket does not list
+        self.reference = {}
+        for bed_range in index.ranges:
+            for item in bed_range.equipment:
+                if item.unit_price is not None or item.name not in self.reference:
+                    self.reference[item.name] = (item.specification, item.unit_price)
+        self.equipment_names = frozenset(self.reference)
+
+    def lines(self, pos):
+        """
+        Return {name: (specification, quantity, unit_price, total)} for a bucket, compiled on first use.
+        """
+        lines = self._lines.get(pos)
+        if lines is None:
+            lines = self._lines[pos] = {
+                item.name: (item.specification, item.quantity, item.unit_price, item.cost)
+                for item in self.index.ranges[pos].equipment
+            }
+        return lines
+
+    def compare(self, bed_count, scenarios):
+        """
+        Return the base requirements for bed_count and each scenario's result and diff.
+        Raises ValueError if a bed count falls outside the workbook ranges.
+        """
+        base_pos = self._find(bed_count)
+        base = self._summary(base_pos, self.lines(base_pos), self.index.ranges[base_pos].autoclave_model,
+                             self.index.ranges[base_pos].autoclave_quantity)
+        results = []
+        for scenario in scenarios:
+            target = scenario.bed_count if scenario.bed_count is not None else bed_count + scenario.bed_delta
+            pos = self._find(target)
+            key = (base_pos, pos, scenario.key())
+            result = self.cache.get(key)
+            if result is None:
+                result = self._evaluate(base, base_pos, pos, scenario)
+                self.cache.put(key, result)
+            results.append({'name': scenario.name, 'bed_count': target, **result})
+        base = {'bed_count': bed_count, **base}
+        base['equipment'] = [
+            {'name': name, 'specification': spec, 'quantity': quantity, 'unit_price': price, 'total_price': total}
+            for name, (spec, quantity, price, total) in base['equipment'].items()
+        ]
+        return {'base': base, 'scenarios': results}
+
+    def _find(self, bed_count):
+        pos = self.index.find(bed_count) if bed_count > 0 else None
+        if pos is None:
+            raise ValueError(f"Could not determine requirements for {bed_count} beds")
+        return pos
+
+    def _evaluate(self, base, base_pos, pos, scenario):
+        bed_range = self.index.ranges[pos]
+        source = self.lines(pos)
+        lines = dict(source)
+        total = base['equipment_total'] if pos == base_pos else _sum_totals(source)
+        autoclave_model, autoclave_quantity = bed_range.autoclave_model, bed_range.autoclave_quantity
+
+        touched = {}
+        if scenario.autoclave is not None:
+            chosen = AUTOCLAVE_TYPES[scenario.autoclave]
+            for name in AUTOCLAVE_TYPES.values():
+                if name != chosen and name in lines:
+                    touched[name] = None
+            spec, quantity, price = self._line_or_reference(lines, chosen)
+            primary = autoclave_quantity if is_number(autoclave_quantity) else 1
+            quantity = max(quantity if is_number(quantity) else 0, primary)
+            touched[chosen] = (spec, quantity, price)
+            autoclave_model = f"{scenario.autoclave.capitalize()}: {spec}"
+            autoclave_quantity = quantity
+
+        for name, quantity in scenario.quantities:
+            spec, _, price = touched.get(name) or self._line_or_reference(lines, name)
+            touched[name] = (spec, quantity, price) if quantity else None
+        for name, price in scenario.prices:
+            line = touched[name] if name in touched else lines.get(name)
+            if line is not None:  # Prices of items this scenario does not use are ignored
+                touched[name] = (line[0], line[1], price)
+
+        # Only the touched lines are recomputed; the total moves by their difference
+        for name, line in touched.items():
+            old = lines.pop(name, None)
+            if old is not None:
+                total -= old[3]
+            if line is not None:
+                lines[name] = (*line, line_cost(line[1], line[2]))
+                total += lines[name][3]
+
+        result = self._summary(pos, lines, autoclave_model, autoclave_quantity, total)
+        result['diff'] = self._diff(base, result, self.lines(base_pos), lines)
+        del result['equipment']
+        return result
+
+    def _line_or_reference(self, lines, name):
+        if name in lines:
+            return lines[name][:3]
+        spec, price = self.reference.get(name, (None, None))
+        return spec, 0, price
+
+    def _summary(self, pos, lines, autoclave_model, autoclave_quantity, total=None):
+        bed_range = self.index.ranges[pos]
+        return {
+            'bed_range': bed_range.original_range,
+            'cssd_area': bed_range.area,
+            'autoclave_model': autoclave_model,
+            'autoclave_quantity': autoclave_quantity,
+            'equipment_total': _sum_totals(lines) if total is None else total,
+            'official_budget': {'min': bed_range.budget.min, 'max': bed_range.budget.max},
+            'equipment': lines
+        }
+
+    @staticmethod
+    def _diff(base, result, base_lines, lines):
+        equipment = []
+        for name in list(base_lines) + [name for name in lines if name not in base_lines]:
+            old, new = base_lines.get(name), lines.get(name)
+            if old == new:
+                continue
+            old, new = old or (None, 0, None, 0), new or (None, 0, None, 0)
+            equipment.append({
+                'name': name,
+                'quantity': [old[1], new[1]],
+                'unit_price': [old[2], new[2]],
+                'total_price': [old[3], new[3]]
+            })
+        return {
+            'cssd_area': _delta(base['cssd_area'], result['cssd_area']),
+            'autoclave_quantity': _delta(base['autoclave_quantity'], result['autoclave_quantity']),
+            'equipment_total': result['equipment_total'] - base['equipment_total'],
+            'official_budget': {
+                'min': _delta(base['official_budget']['min'], result['official_budget']['min']),
+                'max': _delta(base['official_budget']['max'], result['official_budget']['max'])
+            },
+            'equipment': equipment
+        }
+
+
+def whatif_engine_for(data):
+    """
+    Return the WhatIfEngine for a data set, building it on first use.
+    """
+    engine = data.get('whatif_engine')
+    if engine is None:
+        engine = data['whatif_engine'] = WhatIfEngine(data['index'])
+    return engine
+
+
+def parse_whatif_request(payload, equipment_names):
+    """
+    Validate a what-if request body. Returns (bed_count, scenarios) or raises ValueError.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object with bed_count and scenarios")
+    bed_count = payload.get('bed_count')
+    if not _is_int(bed_count) or bed_count <= 0:
+        raise ValueError("Please enter a valid positive number of beds")
+    scenarios = payload.get('scenarios')
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError("scenarios must be a non-empty list")
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios can be compared per request")
+    return bed_count, [Scenario.from_dict(scenario, equipment_names) for scenario in scenarios]
+
+
+def _overrides(values, field, equipment_names, valid):
+    if values is None:
+        return ()
+    if not isinstance(values, dict):
+        raise ValueError(f"{field} must map equipment names to values")
+    for name, value in values.items():
+        if name not in equipment_names:
+            raise ValueError(f"Unknown equipment '{name}' in {field}")
+        if not valid(value):
+            raise ValueError(f"Invalid value for '{name}' in {field}")
+    return tuple(sorted(values.items()))
+
+
+def _is_amount(value):
+    return is_number(value) and value >= 0
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _sum_totals(lines):
+    return sum(line[3] for line in lines.values())
+
+
+def _delta(old, new):
+    if is_number(old) and is_number(new):
+        return new - old
+    return None